@@ -1,26 +1,36 @@
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 import re
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import base64
 import hmac
 import hashlib
 import json
 
+from cache import TTLCache
 from model import User
-from connections import get_session
-from security import verify_password
+import connections
+from connections import get_async_session
+from security import verify_and_update_async
 from schemas import Token
+import timing
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 ALGORITHM = "HS256"
 LIFETIME_IN_MINUTES = 30
 
+# verified claims live until the token's own exp, user rows only briefly
+token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)), ttl=LIFETIME_IN_MINUTES * 60)
+user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", 10000)), ttl=float(os.getenv("USER_CACHE_TTL", 30)))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -28,16 +38,26 @@ def create_access_token(
     data: dict,
     expires_delta: Optional[timedelta] = None
 ) -> str:
+    from jose import jwt  # only needed to issue tokens, verification below is hand-rolled
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=LIFETIME_IN_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def authenticate_user(db: Session, username: str, password: str) -> User:
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> User:
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    if not user:
+        return None
+    # give the connection back to the pool while Argon2 runs
+    await db.commit()
+    valid, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def _b64url_decode(data: str) -> bytes:
@@ -47,12 +67,26 @@ def _b64url_decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_session),
-) -> User:
-    header_b64, payload_b64, sig_b64 = token.split(".")
-    payload_json = _b64url_decode(payload_b64).decode("utf-8")
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def verify_token(token: str) -> dict:
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+
+    try:
+        header_b64, payload_b64, sig_b64 = token.split(".")
+        payload_json = _b64url_decode(payload_b64).decode("utf-8")
+        actual_sig = _b64url_decode(sig_b64)
+    except ValueError:
+        raise _unauthorized("Malformed token")
+
     signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
     expected_sig = hmac.new(
         key=SECRET_KEY.encode("utf-8"),
@@ -60,24 +94,62 @@ def get_current_user(
         digestmod=hashlib.sha256
     ).digest()
 
-    actual_sig = _b64url_decode(sig_b64)
-    print(expected_sig)
-    print(actual_sig)
     if not hmac.compare_digest(expected_sig, actual_sig):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token signature",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    payload = json.loads(payload_json)
-    user_id =  payload.get("sub")
-    user = db.get(User, user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Invalid token signature")
+
+    claims = json.loads(payload_json)
+    expires_at = claims.get("exp")
+    if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+        raise _unauthorized("Token expired")
+
+    token_cache.set(token, claims, expires_at=expires_at)
+    return claims
+
 
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    # no ADMIN_API_KEY configured means no admin endpoints at all
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(
+            x_admin_key.encode("utf-8"), ADMIN_API_KEY.encode("utf-8")):
+        raise HTTPException(status.HTTP_403_FORBIDDEN, "Admin key required")
+
+
+def invalidate_user(user_id: UUID):
+    user_cache.pop(user_id)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session),
+) -> User:
+    with timing.phase("jwt"):
+        claims = verify_token(token)
+    try:
+        user_id = UUID(claims.get("sub"))
+    except (TypeError, ValueError):
+        raise _unauthorized("Invalid token subject")
+
+    with timing.phase("user"):
+        db.info["user_id"] = user_id
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+
+        user = await db.get(User, user_id)
+        if not user:
+            raise _unauthorized("User not found")
+
+        # the cached row is shared between requests, so it must not stay bound to this session
+        db.expunge(user)
+        user_cache.set(user_id, user)
+        # GET handlers read through another session, don't leave this one's connection checked out
+        await db.commit()
     return user
+
+
+def read_sessionmaker(request: Request, current_user: User):
+    return connections.read_sessionmaker(current_user.id, connections.written_at(request.cookies))
+
+
+async def get_read_session(request: Request, current_user: User = Depends(get_current_user)):
+    async with read_sessionmaker(request, current_user)() as session:
+        yield session
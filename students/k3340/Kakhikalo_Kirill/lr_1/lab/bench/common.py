@@ -0,0 +1,36 @@
+"""Shared setup for the scripts in bench/. Run them from the lab directory: python bench/<name>.py"""
+import os
+import sys
+import tempfile
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_env(db_name: str = "bench.db") -> str:
+    """Point the app at a throwaway SQLite file unless DB_ADMIN is already set."""
+    if LAB_DIR not in sys.path:
+        sys.path.insert(0, LAB_DIR)
+    path = os.path.join(tempfile.gettempdir(), db_name)
+    if "DB_ADMIN" not in os.environ:
+        if os.path.exists(path):
+            os.remove(path)
+        os.environ["DB_ADMIN"] = f"sqlite:///{path}"
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+    os.environ.setdefault("PEPPER", "bench-pepper")
+    # the scratch databases are never migrated, let the app create its tables
+    os.environ.setdefault("DB_CREATE_ALL", "1")
+    return os.environ["DB_ADMIN"]
+
+
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary(samples: list) -> str:
+    ms = [s * 1000 for s in samples]
+    return (f"n={len(ms)} p50={percentile(ms, 50):.1f}ms p95={percentile(ms, 95):.1f}ms "
+            f"p99={percentile(ms, 99):.1f}ms max={max(ms, default=0):.1f}ms")
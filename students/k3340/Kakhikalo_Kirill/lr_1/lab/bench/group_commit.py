@@ -0,0 +1,68 @@
+"""Transaction-create throughput and latency with group commit off and at several windows.
+
+    python bench/group_commit.py --writers 32 --posts 30 --windows 0 1 2 5 10
+
+Window 0 is the plain per-request commit. Each writer posts to its own account, so batches are
+not serialized on one row lock.
+"""
+import argparse
+import asyncio
+import time
+
+from common import setup_env, summary
+
+setup_env("bench_group_commit.db")
+
+import httpx  # noqa: E402
+
+import connections  # noqa: E402
+import group_commit  # noqa: E402
+import main  # noqa: E402
+
+
+async def writer(client, headers, account_id, category_id, posts, latencies):
+    for _ in range(posts):
+        started = time.perf_counter()
+        response = await client.post(
+            f"/accounts/{account_id}/transactions",
+            json={"account_id": account_id, "amount": 1, "category_id": category_id, "description": None},
+            headers=headers,
+        )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    connections.init_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await client.post("/users", json={"username": "gc", "email": "gc@bench", "password": "gc-password"})
+        token = (await client.post("/token", data={"username": "gc", "password": "gc-password"})).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        accounts = [
+            (await client.post("/accounts", json={"name": f"gc{i}", "balance": 0, "currency": "RUB"},
+                               headers=headers)).json()["id"]
+            for i in range(args.writers)
+        ]
+        category = (await client.post("/categories", json={"name": "gc"})).json()["id"]
+
+        for window in args.windows:
+            group_commit.committer = (group_commit.GroupCommitter(connections.AsyncSessionLocal, window / 1000,
+                                                                  args.max_batch)
+                                      if window else None)
+            latencies = []
+            started = time.perf_counter()
+            await asyncio.gather(*(writer(client, headers, account, category, args.posts, latencies)
+                                   for account in accounts))
+            elapsed = time.perf_counter() - started
+            label = f"window {window:g}ms" if window else "no group commit"
+            print(f"{label:>16}: {len(latencies) / elapsed:6.0f} req/s  {summary(latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--posts", type=int, default=30)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5, 10])
+    parser.add_argument("--max-batch", type=int, default=group_commit.MAX_BATCH)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""Many concurrent writers posting to one account: checks for lost updates and reports throughput.
+
+    python bench/hot_account.py --writers 32 --posts 50
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from common import setup_env, summary
+
+setup_env("bench_hot_account.db")
+
+import httpx  # noqa: E402
+
+import connections  # noqa: E402
+import main  # noqa: E402
+
+INITIAL_BALANCE = 1000
+
+
+async def writer(client, headers, account_id, category_id, posts, accepted, latencies):
+    for _ in range(posts):
+        amount = random.choice((-30, -10, 5, 20))
+        started = time.perf_counter()
+        response = await client.post(
+            f"/accounts/{account_id}/transactions",
+            json={"account_id": account_id, "amount": amount, "category_id": category_id, "description": None},
+            headers=headers,
+        )
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 201:
+            accepted.append(amount)
+        elif response.status_code != 400:
+            response.raise_for_status()
+
+
+async def run(args):
+    connections.init_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await client.post("/users", json={"username": "hot", "email": "hot@bench", "password": "hot-password"})
+        token = (await client.post("/token", data={"username": "hot", "password": "hot-password"})).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        account = (await client.post("/accounts", json={"name": "hot", "balance": INITIAL_BALANCE, "currency": "RUB"},
+                                     headers=headers)).json()
+        category = (await client.post("/categories", json={"name": "hot"})).json()
+
+        accepted, latencies = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(client, headers, account["id"], category["id"], args.posts, accepted, latencies)
+                               for _ in range(args.writers)))
+        elapsed = time.perf_counter() - started
+
+        balance = (await client.get(f"/accounts/{account['id']}", headers=headers)).json()["balance"]
+
+    expected = INITIAL_BALANCE + sum(accepted)
+    print(f"requests: {len(latencies)} in {elapsed:.2f}s, {len(latencies) / elapsed:.0f} req/s, "
+          f"{len(accepted)} accepted")
+    print(f"latency: {summary(latencies)}")
+    print(f"balance: {balance}, expected {expected}")
+    if balance != expected or balance < 0:
+        raise SystemExit("lost update detected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--posts", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,223 @@
+"""End-to-end HTTP benchmark: runs main:app under uvicorn, seeds data and drives every endpoint.
+
+    python bench/http_bench.py                      # compare with bench/baseline.json if it exists
+    python bench/http_bench.py --save-baseline      # record a new baseline on this machine
+    DB_ADMIN=postgresql+pg8000://... python bench/http_bench.py
+
+Prints throughput and p50/p95/p99 per endpoint. Exits 1 when an endpoint's p95 or throughput is
+worse than the baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from common import LAB_DIR, percentile, setup_env
+
+setup_env("bench_http.db")
+
+import httpx  # noqa: E402
+
+import connections  # noqa: E402
+
+BASELINE = os.path.join(LAB_DIR, "bench", "baseline.json")
+PASSWORD = "bench-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=LAB_DIR,
+        env=os.environ.copy(),
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            await client.get("/categories")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise SystemExit("server did not start")
+
+
+async def seed(client: httpx.AsyncClient, args) -> dict:
+    categories = []
+    for i in range(args.categories):
+        categories.append((await client.post("/categories", json={"name": f"bench-{i}"})).json()["id"])
+
+    await client.post("/users", json={"username": "bench", "email": "bench@bench", "password": PASSWORD})
+    token = (await client.post("/token", data={"username": "bench", "password": PASSWORD})).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    accounts = []
+    for i in range(args.accounts):
+        account = (await client.post("/accounts", json={"name": f"bench-{i}", "balance": 10 ** 9, "currency": "RUB"},
+                                     headers=headers)).json()
+        accounts.append(account["id"])
+        lines = ["amount,category_id,timestamp,description"]
+        start = time.time() - 365 * 24 * 3600
+        for n in range(args.transactions):
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start + n * 365 * 24 * 3600 / args.transactions))
+            lines.append(f"{random.randint(-5000, 3000)},{random.choice(categories)},{timestamp},row {n}")
+        response = await client.post(f"/accounts/{account['id']}/transactions/import",
+                                     content="\n".join(lines).encode(),
+                                     headers={**headers, "Content-Type": "text/csv"}, timeout=300)
+        response.raise_for_status()
+
+        for b in range(args.budgets):
+            await client.post("/budgets", json={
+                "account_id": account["id"], "limit": 100000,
+                "start_date": "2000-01-01T00:00:00", "end_date": "2100-01-01T00:00:00",
+                "category_ids": random.sample(categories, 3),
+            }, headers=headers)
+        await client.post("/targets", json={"account_id": account["id"], "name": "bench", "target_amount": 10 ** 10,
+                                            "deadline": "2100-01-01T00:00:00"}, headers=headers)
+
+    return {"headers": headers, "accounts": accounts, "categories": categories}
+
+
+def scenarios(data: dict) -> dict:
+    headers = data["headers"]
+
+    def login(client):
+        return client.post("/token", data={"username": "bench", "password": PASSWORD})
+
+    def accounts(client):
+        return client.get("/accounts", headers=headers)
+
+    def transactions_list(client):
+        return client.get(f"/accounts/{random.choice(data['accounts'])}/transactions", headers=headers)
+
+    def transactions_create(client):
+        account_id = random.choice(data["accounts"])
+        return client.post(f"/accounts/{account_id}/transactions", headers=headers, json={
+            "account_id": account_id, "amount": random.randint(-100, 100),
+            "category_id": random.choice(data["categories"]), "description": "bench",
+        })
+
+    def budgets(client):
+        return client.get("/budgets", headers=headers)
+
+    def targets(client):
+        return client.get("/targets", headers=headers)
+
+    def dashboard(client):
+        return client.get("/users/me/dashboard", headers=headers)
+
+    return {
+        "login": login,
+        "accounts": accounts,
+        "transactions_list": transactions_list,
+        "transactions_create": transactions_create,
+        "budgets": budgets,
+        "targets": targets,
+        "dashboard": dashboard,
+    }
+
+
+async def drive(client: httpx.AsyncClient, request, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await request(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "throughput": len(ms) / elapsed,
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95']:.1f}ms vs baseline {base['p95']:.1f}ms")
+        if result["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput']:.0f} req/s vs baseline {base['throughput']:.0f} req/s")
+    return regressions
+
+
+async def run(args) -> int:
+    connections.init_db()
+    port = free_port()
+    server = start_server(port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                     limits=httpx.Limits(max_connections=args.concurrency * 2)) as client:
+            await wait_ready(client)
+            data = await seed(client, args)
+            results = {}
+            for name, request in scenarios(data).items():
+                if args.only and name not in args.only:
+                    continue
+                results[name] = await drive(client, request, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{'endpoint':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['throughput']:>9.0f}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+              f"{result['p99']:>9.1f}{result['errors']:>8}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with, run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per endpoint")
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--transactions", type=int, default=20000, help="per account")
+    parser.add_argument("--categories", type=int, default=30)
+    parser.add_argument("--budgets", type=int, default=4, help="per account")
+    parser.add_argument("--only", nargs="*", help="run only these endpoints")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    sys.exit(asyncio.run(run(parser.parse_args())))
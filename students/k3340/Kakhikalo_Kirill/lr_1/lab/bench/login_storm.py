@@ -0,0 +1,60 @@
+"""Read latency while a burst of logins saturates the Argon2 pool.
+
+    python bench/login_storm.py --logins 200 --readers 4 --duration 10
+"""
+import argparse
+import asyncio
+import time
+
+from common import setup_env, summary
+
+setup_env("bench_login_storm.db")
+
+import httpx  # noqa: E402
+
+import connections  # noqa: E402
+import main  # noqa: E402
+
+
+async def reader(client, deadline, samples):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/categories")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+
+
+async def login(client, codes):
+    response = await client.post("/token", data={"username": "storm", "password": "storm-password"})
+    codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+
+async def run(args):
+    connections.init_db()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/users", json={"username": "storm", "email": "storm@bench", "password": "storm-password"})
+        for i in range(20):
+            await client.post("/categories", json={"name": f"category-{i}"})
+
+        quiet = []
+        await asyncio.gather(*(reader(client, time.perf_counter() + args.duration / 2, quiet)
+                               for _ in range(args.readers)))
+
+        stormy, codes = [], {}
+        deadline = time.perf_counter() + args.duration / 2
+        storm = asyncio.gather(*(login(client, codes) for _ in range(args.logins)))
+        await asyncio.gather(*(reader(client, deadline, stormy) for _ in range(args.readers)))
+        await storm
+
+    print(f"reads, idle:        {summary(quiet)}")
+    print(f"reads, login storm: {summary(stormy)}")
+    print(f"login status codes: {codes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""ORM + pydantic response path vs. the column-select + fast JSON path, for one list of N transactions.
+
+    python bench/serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from common import setup_env
+
+setup_env("bench_serialization.db")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+import connections  # noqa: E402
+import fastjson  # noqa: E402
+import listing  # noqa: E402
+from model import Account, Category, Transaction, User  # noqa: E402
+from schemas import TransactionRead  # noqa: E402
+
+
+async def seed(rows: int) -> uuid.UUID:
+    connections.init_db()
+    async with connections.AsyncSessionLocal() as db:
+        user = User(username="ser", email="ser@bench", hashed_password="x")
+        category = Category(name="ser")
+        db.add_all([user, category])
+        await db.flush()
+        account = Account(user_id=user.id, name="ser", balance=0, currency="RUB")
+        db.add(account)
+        await db.flush()
+        start = datetime(2024, 1, 1)
+        await db.execute(insert(Transaction), [
+            {"id": uuid.uuid4(), "account_id": account.id, "amount": -i, "timestamp": start + timedelta(minutes=i),
+             "category_id": category.id, "description": f"row {i}"}
+            for i in range(rows)
+        ])
+        await db.commit()
+        return account.id
+
+
+async def orm_path(account_id) -> bytes:
+    async with connections.AsyncSessionLocal() as db:
+        rows = (await db.scalars(
+            select(Transaction).options(joinedload(Transaction.category)).where(Transaction.account_id == account_id)
+        )).all()
+        # what FastAPI does for response_model=List[TransactionRead]
+        validated = TypeAdapter(List[TransactionRead]).validate_python(rows, from_attributes=True)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+
+async def fast_path(account_id) -> bytes:
+    async with connections.AsyncSessionLocal() as db:
+        rows = await db.execute(listing.TRANSACTION_COLUMNS.where(Transaction.account_id == account_id))
+        return fastjson.FastJSONResponse(listing.transaction_rows(rows)).body
+
+
+async def measure(path, account_id, repeat: int) -> float:
+    await path(account_id)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await path(account_id)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def run(args):
+    account_id = await seed(args.rows)
+    orm = await measure(orm_path, account_id, args.repeat)
+    fast = await measure(fast_path, account_id, args.repeat)
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"orm + pydantic:     {orm * 1000:.1f}ms")
+    print(f"columns + {'orjson' if fastjson.orjson else 'json'}:   {fast * 1000:.1f}ms  ({orm / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
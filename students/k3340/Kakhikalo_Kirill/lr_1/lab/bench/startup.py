@@ -0,0 +1,92 @@
+"""Cold start: import time of main, and process spawn to the first successful request.
+
+    python bench/startup.py --runs 10
+    python bench/startup.py --importtime       # top modules by cumulative import time
+
+Every run is a fresh interpreter, so nothing is shared with the previous one but the OS page cache.
+The scratch database is migrated once up front, so the spawns start the way production does,
+with a schema check rather than create_all.
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+from common import LAB_DIR, setup_env, summary
+
+setup_env("bench_startup.db")
+os.environ.pop("DB_CREATE_ALL", None)
+
+import httpx  # noqa: E402
+from alembic import command  # noqa: E402
+
+import schema_check  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=LAB_DIR, env=os.environ.copy(), check=True)
+    return time.perf_counter() - started
+
+
+def first_request_time(timeout: float = 30) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=LAB_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get("/categories").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise SystemExit("server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def top_imports(count: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=LAB_DIR,
+                            env=os.environ.copy(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(3)) <= 3:
+            rows.append((int(match.group(2)), match.group(4)))
+    for cumulative, name in sorted(rows, reverse=True)[:count]:
+        print(f"{cumulative / 1000:8.1f}ms  {name}")
+
+
+def main(args):
+    if args.importtime:
+        top_imports(args.top)
+        return
+    command.upgrade(schema_check.alembic_config(), "head")
+    imports = [import_time() for _ in range(args.runs)]
+    print(f"      import main: {summary(imports)}")
+    requests = [first_request_time() for _ in range(args.runs)]
+    print(f"spawn to first ok: {summary(requests)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    main(parser.parse_args())
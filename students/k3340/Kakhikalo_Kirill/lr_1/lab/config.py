@@ -0,0 +1,7 @@
+"""Reads .env into the environment once per process; import it before any os.getenv of a setting."""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# the newest revision in migrations/versions, checked at start-up; schema_check.py fails when it falls behind
+SCHEMA_REVISION = "a2f6c83e1d07"
@@ -1,12 +1,185 @@
-from sqlmodel import Session, create_engine
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from cache import TTLCache
 from model import Base
+from pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+import contextvars
+import math
 import os
-from dotenv import load_dotenv
+import time
+from typing import Optional
+from config import SCHEMA_REVISION
 
-load_dotenv()
 db_url = os.getenv('DB_ADMIN')
 
-engine = create_engine(db_url, echo=True)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+async_db_url = os.getenv('DB_ADMIN_ASYNC') or to_async_url(db_url)
+
+# optional replica for GET handlers; without DB_READ reads go to the primary
+read_db_url = os.getenv('DB_READ')
+read_async_db_url = os.getenv('DB_READ_ASYNC') or (to_async_url(read_db_url) if read_db_url else None)
+# after a user's own commit, their reads stay on the primary this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def engine_options() -> dict:
+    return {
+        "echo": _env_flag('DB_ECHO'),
+        "pool_size": int(os.getenv('DB_POOL_SIZE', 5)),
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        "pool_timeout": float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', -1)),
+        "pool_pre_ping": _env_flag('DB_POOL_PRE_PING'),
+    }
+
+
+engine = create_engine(db_url, poolclass=InstrumentedQueuePool, **engine_options())
+async_engine = create_async_engine(async_db_url, poolclass=InstrumentedAsyncQueuePool, **engine_options())
+async_read_engine = (create_async_engine(read_async_db_url, poolclass=InstrumentedAsyncQueuePool, **engine_options())
+                     if read_async_db_url else async_engine)
+
+
+
+def _sqlite_immediate_transactions(sync_engine):
+    """SQLite stand-in only: take the write lock at BEGIN.
+
+    With the driver's deferred BEGIN, two writers that both read first deadlock and one gets
+    "database is locked" right away instead of waiting for busy_timeout.
+    """
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        # the lock is handed out unfairly, so under load give it as long as a pool checkout
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(engine_options()['pool_timeout'] * 1000)}")
+        cursor.close()
+
+    @event.listens_for(sync_engine, "begin")
+    def _begin_immediate(conn):
+        # straight on the DBAPI cursor, so it isn't counted as a query
+        cursor = conn.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.close()
+
+
+_sqlite_immediate_transactions(engine)
+_sqlite_immediate_transactions(async_engine.sync_engine)
+
+class WriteSession(Session):
+    """Sessions on the primary. Commits that wrote something open the user's read-your-writes window."""
+
+
+# this worker's writers; other workers learn about the write from the WRITE_COOKIE on the response
+_recent_writers = TTLCache(maxsize=100000, ttl=READ_YOUR_WRITES_SECONDS)
+WRITE_COOKIE = "wrote_at"
+# per request, set by ReadYourWritesMiddleware: {"at": unix time of the request's last write}
+_request_write = contextvars.ContextVar("request_write", default=None)
+
+
+def mark_write(user_id):
+    _recent_writers.set(user_id, True)
+    request_write = _request_write.get()
+    if request_write is not None:
+        request_write["at"] = time.time()
+
+
+def written_at(cookies: dict) -> Optional[float]:
+    try:
+        return float(cookies[WRITE_COOKIE])
+    except (KeyError, ValueError):
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """Puts the time of the request's write into a short-lived cookie, so every worker honours the window.
+
+    A forged or stale cookie can only send the client's reads to the primary.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_write = {}
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and "at" in request_write:
+                cookie = (f"{WRITE_COOKIE}={request_write['at']:.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        token = _request_write.set(request_write)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_write.reset(token)
+
+
+@event.listens_for(WriteSession, "do_orm_execute")
+def _note_statement_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(WriteSession, "after_flush")
+def _note_flush_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _open_read_your_writes(session):
+    # user_id is put there by auth.get_current_user
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        mark_write(session.info["user_id"])
+
+
+@event.listens_for(WriteSession, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, sync_session_class=WriteSession,
+                                       expire_on_commit=False)
+ReadSessionLocal = (async_sessionmaker(async_read_engine, class_=AsyncSession, expire_on_commit=False)
+                    if async_read_engine is not async_engine else AsyncSessionLocal)
+
+
+def read_sessionmaker(user_id=None, wrote_at: Optional[float] = None):
+    """The replica, unless this user committed a write within READ_YOUR_WRITES_SECONDS.
+
+    `wrote_at` comes from the client's WRITE_COOKIE and covers writes that went through another worker.
+    """
+    if user_id is not None and _recent_writers.get(user_id):
+        return AsyncSessionLocal
+    if wrote_at is not None and time.time() - wrote_at < READ_YOUR_WRITES_SECONDS:
+        return AsyncSessionLocal
+    return ReadSessionLocal
 
 
 def init_db():
@@ -14,6 +187,35 @@ def init_db():
     print('created tables')
 
 
+def check_schema():
+    """One query at boot instead of create_all's catalog round: is the database at our migration?
+
+    DB_CREATE_ALL=1 keeps the old create_all behaviour for throwaway local databases.
+    """
+    if _env_flag('DB_CREATE_ALL'):
+        init_db()
+        return
+    with engine.connect() as conn:
+        try:
+            revision = conn.scalar(text("SELECT version_num FROM alembic_version"))
+        except exc.DBAPIError:
+            revision = None
+    if revision != SCHEMA_REVISION:
+        raise RuntimeError(f"database schema is at {revision or 'nothing'}, expected {SCHEMA_REVISION}; "
+                           "run `alembic upgrade head` (or set DB_CREATE_ALL=1 for a scratch database)")
+
+
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_read_session():
+    """For anonymous GET handlers; authenticated ones use auth.get_read_session."""
+    async with ReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,88 @@
+"""Everything the home screen shows, in a fixed number of queries however many accounts there are."""
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import ledger
+import listing
+import progress
+from model import Account, Budget
+
+RECENT_TRANSACTIONS = int(os.getenv("DASHBOARD_TRANSACTIONS", 5))
+MAX_RECENT_TRANSACTIONS = 50
+
+
+async def latest_transactions(db: AsyncSession, user_id: UUID, per_account: int) -> Dict[UUID, List[dict]]:
+    """The newest `per_account` rows of each of the user's accounts, one statement of fixed shape.
+
+    Postgres runs a LIMIT per account through LATERAL, walking the (account_id, timestamp, id)
+    index backwards. SQLite has no LATERAL, so there a row_number() window ranks the user's rows.
+    """
+    grouped = defaultdict(list)
+    if per_account <= 0:
+        return grouped
+    history = listing.TRANSACTION_HISTORY.c
+    newest_first = (history.timestamp.desc(), history.id.desc())
+    if db.get_bind().dialect.name == "postgresql":
+        latest = (
+            listing.TRANSACTION_COLUMNS
+            .where(history.account_id == Account.id)
+            .order_by(*newest_first)
+            .limit(per_account)
+            .lateral("latest")
+        )
+        query = select(latest).select_from(Account).join(latest, true()).where(Account.user_id == user_id)
+    else:
+        latest = (
+            listing.TRANSACTION_COLUMNS
+            .add_columns(func.row_number().over(partition_by=history.account_id, order_by=newest_first).label("rank"))
+            .where(history.account_id.in_(select(Account.id).where(Account.user_id == user_id)))
+            .subquery("latest")
+        )
+        query = select(*(column for column in latest.c if column.name != "rank")).where(latest.c.rank <= per_account)
+    rows = await db.execute(query.order_by(latest.c.account_id, latest.c.timestamp.desc(), latest.c.id.desc()))
+    for row in listing.transaction_rows(rows):
+        grouped[row["account_id"]].append(row)
+    return grouped
+
+
+async def dashboard(db: AsyncSession, user, per_account: int) -> dict:
+    """Accounts with their latest transactions, the budgets running now with usage, and targets.
+
+    Seven queries at most: accounts, their transactions, budgets, the budgets' categories and
+    spending, targets, and the targets' flow averages when those are not cached.
+    """
+    accounts = listing.plain(await db.execute(listing.ACCOUNT_COLUMNS.where(Account.user_id == user.id)))
+    recent = await latest_transactions(db, user.id, per_account)
+    for account in accounts:
+        account["recent_transactions"] = recent[account["id"]]
+
+    now = datetime.utcnow()
+    budgets = listing.plain(await db.execute(
+        listing.BUDGET_COLUMNS.where(Account.user_id == user.id, Budget.start_date <= now, Budget.end_date >= now)
+    ))
+    budget_ids = [budget["id"] for budget in budgets]
+    categories = await listing.budget_categories_by_id(db, budget_ids)
+    spent = await ledger.budget_spent(db, budget_ids)
+    for budget in budgets:
+        budget["categories"] = categories[budget["id"]]
+        budget["spent"] = spent[budget["id"]]
+        budget["remaining"] = budget["limit"] - budget["spent"]
+        budget["exceeded"] = budget["spent"] > budget["limit"]
+
+    targets = listing.plain(await db.execute(listing.TARGET_COLUMNS.where(Account.user_id == user.id)))
+    progress.annotate(targets, await progress.average_daily_net(
+        db, {target["account_id"]: target["account_updated_at"] for target in targets}
+    ))
+
+    return {
+        "user": {"id": user.id, "username": user.username, "email": user.email, "created_at": user.created_at},
+        "accounts": accounts,
+        "budgets": budgets,
+        "targets": targets,
+    }
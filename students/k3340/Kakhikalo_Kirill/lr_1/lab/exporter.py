@@ -0,0 +1,62 @@
+import csv
+import io
+from typing import AsyncIterator
+from uuid import UUID
+
+from sqlalchemy import select, union_all
+
+import fastjson
+from model import Category, Transaction, transactions_archive
+
+BATCH_SIZE = 1000
+
+# the importer accepts this header as-is, so an export can be re-imported into another account
+COLUMNS = ("id", "timestamp", "amount", "category_id", "category_name", "description")
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _query(account_id: UUID):
+    # archived partitions hold the oldest rows, so they come first
+    history = union_all(*(
+        select(table.c.id, table.c.timestamp, table.c.amount, table.c.category_id, table.c.description)
+        .where(table.c.account_id == account_id)
+        for table in (transactions_archive, Transaction.__table__)
+    )).subquery()
+    return (
+        select(history.c.id, history.c.timestamp, history.c.amount, history.c.category_id,
+               Category.name.label("category_name"), history.c.description)
+        .join(Category, Category.id == history.c.category_id)
+        .order_by(history.c.timestamp, history.c.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+
+
+def _csv_chunk(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(
+        (row.id, row.timestamp.isoformat(), row.amount, row.category_id, row.category_name, row.description or "")
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunk(rows) -> bytes:
+    return b"".join(fastjson.dumps(dict(zip(COLUMNS, row))) + b"\n" for row in rows)
+
+
+async def export_transactions(account_id: UUID, fmt: str, session_factory) -> AsyncIterator[bytes]:
+    """Yields one chunk per BATCH_SIZE rows read from a server-side cursor.
+
+    The request's session is closed before a streaming body runs, so this opens its own and holds
+    one pooled connection until the last row is sent.
+    """
+    if fmt == "csv":
+        yield _csv_chunk([], header=True)
+    async with session_factory() as db:
+        result = await db.stream(_query(account_id))
+        async for rows in result.partitions():
+            yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(rows)
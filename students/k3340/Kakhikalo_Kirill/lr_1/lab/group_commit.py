@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import os
+from typing import Any, Awaitable, Callable, List, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import connections
+
+T = TypeVar("T")
+
+# GROUP_COMMIT=1 merges concurrent postings into one database transaction
+ENABLED = os.getenv("GROUP_COMMIT") == "1"
+WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 2))
+MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 64))
+
+
+class GroupCommitter:
+    """Collects work for up to `window` seconds or `max_batch` items, then runs it all in one transaction.
+
+    Each item gets a savepoint, so one that raises is rolled back alone and its caller gets the
+    exception. A failed commit fails every caller in the batch, none of their writes persisted.
+
+    Batches overlap, each on its own connection, so every batch takes its row locks in `key`
+    order (the account id): two batches touching the same accounts then queue instead of deadlocking.
+    """
+
+    def __init__(self, session_factory, window: float, max_batch: int):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: List[Tuple[Any, Callable, asyncio.Future]] = []
+        self._full = None
+        self._tasks = set()
+
+    async def submit(self, key, work: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((key, work, future))
+        if self._full is None:
+            self._start_collector()
+        if len(self._queue) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    def _start_collector(self):
+        self._full = asyncio.Event()
+        # a fresh context: the batch's queries are nobody's request budget or timings
+        task = asyncio.get_running_loop().create_task(self._collect(self._full), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _collect(self, full: asyncio.Event):
+        try:
+            await asyncio.wait_for(full.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        self._full = None
+        if self._queue:
+            self._start_collector()
+            if len(self._queue) >= self.max_batch:
+                self._full.set()
+        await self._run(batch)
+
+    async def _run(self, batch: List[Tuple[Any, Callable, asyncio.Future]]):
+        done = []
+        async with self.session_factory() as db:
+            for _, work, future in sorted(batch, key=lambda item: item[0]):
+                try:
+                    async with db.begin_nested():
+                        result = await work(db)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                done.append((future, result))
+            try:
+                await db.commit()
+            except Exception as e:
+                for future, _ in done:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for future, result in done:
+            if not future.done():
+                future.set_result(result)
+
+
+committer = (GroupCommitter(connections.AsyncSessionLocal, WINDOW_MS / 1000, MAX_BATCH)
+             if ENABLED else None)
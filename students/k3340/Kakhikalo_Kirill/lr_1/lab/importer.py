@@ -0,0 +1,173 @@
+import codecs
+import csv
+import json
+import re
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import ledger
+import reports
+import snapshots
+import versions
+from model import Account, Category, Transaction
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+# transactions.amount is a 32-bit Integer column
+AMOUNT_MIN, AMOUNT_MAX = -2 ** 31, 2 ** 31 - 1
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class RowError(ValueError):
+    pass
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+def _parse_amount(value) -> int:
+    """Whole numbers only: a JSON int or an integer string. Floats and booleans are not truncated into one."""
+    if isinstance(value, str) and re.fullmatch(r"[+-]?\d+", value.strip()):
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(value)
+    if not AMOUNT_MIN <= value <= AMOUNT_MAX:
+        raise RowError("amount out of range")
+    return value
+
+
+def _parse_row(raw: dict, categories: Set[UUID], now: datetime) -> dict:
+    try:
+        amount = _parse_amount(raw["amount"])
+        category_id = UUID(str(raw["category_id"]))
+    except KeyError as e:
+        raise RowError(f"missing field {e.args[0]}")
+    except RowError:
+        raise
+    except (TypeError, ValueError):
+        raise RowError("invalid amount or category_id")
+    if category_id not in categories:
+        raise RowError("unknown category")
+
+    timestamp = raw.get("timestamp") or None
+    try:
+        timestamp = ledger.utc_naive(datetime.fromisoformat(timestamp)) if timestamp else now
+    except (TypeError, ValueError):
+        raise RowError("invalid timestamp")
+
+    description = raw.get("description") or None
+    if description is not None and not isinstance(description, str):
+        raise RowError("description must be a string")
+
+    return {
+        "amount": amount,
+        "category_id": category_id,
+        "timestamp": timestamp,
+        "description": description,
+    }
+
+
+async def _records(lines: AsyncIterator[str], content_type: str) -> AsyncIterator[tuple]:
+    """Yields (line number, dict or RowError). CSV needs a header row; quoted newlines are not supported."""
+    header: Optional[List[str]] = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        if content_type in NDJSON_TYPES:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield number, RowError("invalid JSON")
+                continue
+            yield number, record if isinstance(record, dict) else RowError("expected a JSON object")
+            continue
+
+        fields = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        if len(fields) != len(header):
+            yield number, RowError("wrong number of columns")
+            continue
+        yield number, dict(zip(header, fields))
+
+
+async def _flush(db: AsyncSession, batch: List[dict]):
+    if batch:
+        await db.execute(insert(Transaction), batch)
+        batch.clear()
+
+
+async def import_transactions(db: AsyncSession, account: Account, content_type: str,
+                              stream: AsyncIterator[bytes]) -> dict:
+    categories = set((await db.scalars(select(Category.id))).all())
+    now = datetime.utcnow()
+    balance = account.balance
+    this_month = reports.current_month()
+    backdated = False
+    earliest = now.date()
+
+    accepted = rejected = 0
+    errors: List[dict] = []
+    batch: List[dict] = []
+    flows: Dict[ledger.FlowKey, list] = {}
+
+    async for number, record in _records(_lines(stream), content_type):
+        try:
+            if isinstance(record, RowError):
+                raise record
+            row = _parse_row(record, categories, now)
+            if balance + row["amount"] < 0:
+                raise RowError("not enough money")
+        except RowError as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": number, "error": str(e)})
+            continue
+
+        balance += row["amount"]
+        accepted += 1
+        batch.append({"id": uuid.uuid4(), "account_id": account.id, **row})
+        ledger.add_flow(flows, account.id, row["category_id"], row["timestamp"].date(), row["amount"])
+        backdated = backdated or row["timestamp"].date() < this_month
+        earliest = min(earliest, row["timestamp"].date())
+        if len(batch) >= BATCH_SIZE:
+            await _flush(db, batch)
+
+    await _flush(db, batch)
+    flow_items = list(flows.items())
+    for start in range(0, len(flow_items), BATCH_SIZE):
+        await ledger.record_flows(db, dict(flow_items[start:start + BATCH_SIZE]))
+    if balance != account.balance:
+        new_balance = await ledger.apply_balance_delta(db, account.id, account.user_id, balance - account.balance)
+        if new_balance is None:
+            await db.rollback()
+            raise HTTPException(409, "Account balance changed during import, nothing was imported")
+    if earliest < now.date():
+        await snapshots.invalidate(db, account.id, earliest)
+    if backdated:
+        # cached closed months of every worker are keyed on these
+        await versions.bump(db, versions.history("account", account.id))
+        await versions.bump(db, versions.history("user", account.user_id))
+    await db.commit()
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
@@ -0,0 +1,176 @@
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Date, and_, cast, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from model import Account, Budget, Category, DailyFlow, Transaction, budget_categories
+
+FlowKey = Tuple[UUID, UUID, date]
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def dialect_insert(db: AsyncSession):
+    return postgresql.insert if _dialect(db) == "postgresql" else sqlite.insert
+
+
+def utc_naive(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; an offset-aware value is converted, a naive one is taken as UTC."""
+    if value.tzinfo is not None:
+        try:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        except OverflowError:
+            # within a day of year 1 or 9999, the offset pushes it out of range
+            return datetime.min if value.year == 1 else datetime.max
+    return value
+
+
+def day_of(db: AsyncSession, column):
+    # sqlite keeps datetimes as text, CAST AS DATE would turn them into a number there
+    return func.date(column) if _dialect(db) == "sqlite" else cast(column, Date)
+
+
+async def apply_balance_delta(db: AsyncSession, account_id: UUID, user_id: UUID, amount: int) -> Optional[int]:
+    """Conditional in-place update, returns the new balance.
+
+    None means the account does not belong to the user or would go below zero. The row stays
+    locked only until the caller's commit, so writers to one account never lose updates.
+    """
+    result = await db.execute(
+        update(Account)
+        .where(Account.id == account_id, Account.user_id == user_id, Account.balance + amount >= 0)
+        .values(balance=Account.balance + amount, updated_at=datetime.utcnow())
+        .returning(Account.balance)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def post_transaction(db: AsyncSession, user_id: UUID, account_id: UUID, category_id: UUID, amount: int,
+                           description: Optional[str]) -> Transaction:
+    """Everything one posting writes, without committing. Sets `alerts` on the returned row.
+
+    Every rejection happens before the first write, so a failed posting leaves the
+    transaction untouched for whatever else shares it.
+    """
+    category = await db.get(Category, category_id)
+    if not category:
+        raise HTTPException(404, "Category not found")
+
+    new_balance = await apply_balance_delta(db, account_id, user_id, amount)
+    if new_balance is None:
+        account_exists = await db.scalar(
+            select(Account.id)
+            .where(Account.id == account_id, Account.user_id == user_id)
+        )
+        if not account_exists:
+            raise HTTPException(404, "Account not found")
+        raise HTTPException(400, "Not enough money")
+
+    transaction = Transaction(
+        account_id=account_id,
+        amount=amount,
+        timestamp=datetime.utcnow(),
+        category_id=category_id,
+        description=description
+    )
+    # assigning the relationship would lazy-load category.transactions through the backref
+    set_committed_value(transaction, "category", category)
+    db.add(transaction)
+    await record_flow(db, account_id, category_id, transaction.timestamp.date(), amount)
+    transaction.alerts = []
+    if amount < 0:
+        transaction.alerts = await overspent_budgets(db, account_id, category_id, transaction.timestamp)
+    return transaction
+
+
+def add_flow(flows: Dict[FlowKey, list], account_id: UUID, category_id: UUID, day: date, amount: int):
+    totals = flows.setdefault((account_id, category_id, day), [0, 0])
+    if amount >= 0:
+        totals[0] += amount
+    else:
+        totals[1] -= amount
+
+
+async def record_flows(db: AsyncSession, flows: Dict[FlowKey, list]):
+    """Add the given in/out totals to daily_flows. Runs inside the caller's transaction."""
+    if not flows:
+        return
+    rows = [
+        {"account_id": account_id, "category_id": category_id, "day": day, "inflow": inflow, "outflow": outflow}
+        for (account_id, category_id, day), (inflow, outflow) in flows.items()
+    ]
+    stmt = dialect_insert(db)(DailyFlow).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyFlow.account_id, DailyFlow.category_id, DailyFlow.day],
+        set_={
+            "inflow": DailyFlow.inflow + stmt.excluded.inflow,
+            "outflow": DailyFlow.outflow + stmt.excluded.outflow,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def record_flow(db: AsyncSession, account_id: UUID, category_id: UUID, day: date, amount: int):
+    flows = {}
+    add_flow(flows, account_id, category_id, day, amount)
+    await record_flows(db, flows)
+
+
+async def affected_budgets(db: AsyncSession, account_id: UUID, category_id: UUID, at: datetime) -> Dict[UUID, int]:
+    """Budgets whose window contains `at` and which cover the category, mapped to their limit.
+
+    Served by ix_budgets_account_window and ix_budget_categories_category_budget.
+    """
+    rows = await db.execute(
+        select(Budget.id, Budget.limit)
+        .join(budget_categories, budget_categories.c.budget_id == Budget.id)
+        .where(
+            budget_categories.c.category_id == category_id,
+            Budget.account_id == account_id,
+            Budget.end_date >= at,
+            Budget.start_date <= at,
+        )
+    )
+    return dict(rows.all())
+
+
+async def overspent_budgets(db: AsyncSession, account_id: UUID, category_id: UUID, at: datetime) -> List[dict]:
+    """Usage of every budget the posting at `at` pushed over its limit. Call after recording its flow."""
+    limits = await affected_budgets(db, account_id, category_id, at)
+    spent = await budget_spent(db, limits)
+    return [
+        {"budget_id": budget_id, "limit": limit, "spent": spent[budget_id],
+         "remaining": limit - spent[budget_id], "exceeded": True}
+        for budget_id, limit in limits.items()
+        if spent[budget_id] > limit
+    ]
+
+
+async def budget_spent(db: AsyncSession, budget_ids: Iterable[UUID]) -> Dict[UUID, int]:
+    """Outflow over each budget's categories and days, one grouped query for all budgets."""
+    budget_ids = list(budget_ids)
+    if not budget_ids:
+        return {}
+    rows = await db.execute(
+        select(Budget.id, func.sum(DailyFlow.outflow))
+        .join(budget_categories, budget_categories.c.budget_id == Budget.id)
+        .join(DailyFlow, and_(
+            DailyFlow.account_id == Budget.account_id,
+            DailyFlow.category_id == budget_categories.c.category_id,
+            DailyFlow.day >= day_of(db, Budget.start_date),
+            DailyFlow.day <= day_of(db, Budget.end_date),
+        ))
+        .where(Budget.id.in_(budget_ids))
+        .group_by(Budget.id)
+    )
+    spent = {budget_id: 0 for budget_id in budget_ids}
+    spent.update({budget_id: total or 0 for budget_id, total in rows})
+    return spent
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+from sqlalchemy import select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model import Account, Budget, Category, Target, Transaction, User, budget_categories, transactions_archive
+
+# Column-only selects for the list endpoints, each row is turned straight into the response shape
+
+USER_COLUMNS = select(User.id, User.username, User.email, User.created_at)
+
+ACCOUNT_COLUMNS = select(Account.name, Account.balance, Account.currency, Account.id, Account.user_id,
+                         Account.created_at, Account.updated_at)
+
+CATEGORY_COLUMNS = select(Category.name, Category.description, Category.id)
+
+TARGET_COLUMNS = (
+    select(Target.account_id, Target.name, Target.target_amount, Target.deadline, Target.description,
+           Target.id, Target.created_at, Account.balance.label("current_amount"),
+           Account.updated_at.label("account_updated_at"))
+    .join(Account, Account.id == Target.account_id)
+)
+
+BUDGET_COLUMNS = (
+    select(Budget.id, Budget.account_id, Budget.limit, Budget.start_date, Budget.end_date)
+    .join(Account, Account.id == Budget.account_id)
+)
+
+# live rows and the archived partitions as one selectable; filters on its columns are pushed down
+# into both tables, so listings reach past ARCHIVE_AFTER_MONTHS at the cost of one extra index probe
+TRANSACTION_HISTORY = union_all(*(
+    select(table.c.id, table.c.account_id, table.c.amount, table.c.timestamp, table.c.category_id,
+           table.c.description)
+    for table in (Transaction.__table__, transactions_archive)
+)).subquery("transaction_history")
+
+TRANSACTION_COLUMNS = (
+    select(TRANSACTION_HISTORY.c.id, TRANSACTION_HISTORY.c.account_id, TRANSACTION_HISTORY.c.amount,
+           TRANSACTION_HISTORY.c.timestamp, TRANSACTION_HISTORY.c.description, Category.name.label("category_name"),
+           Category.description.label("category_description"), Category.id.label("category_id"))
+    .join(Category, Category.id == TRANSACTION_HISTORY.c.category_id)
+)
+
+
+def plain(rows: Iterable) -> List[dict]:
+    return [dict(row._mapping) for row in rows]
+
+
+def transaction_rows(rows: Iterable) -> List[dict]:
+    return [
+        {
+            "id": row.id,
+            "account_id": row.account_id,
+            "amount": row.amount,
+            "timestamp": row.timestamp,
+            "category": {"name": row.category_name, "description": row.category_description, "id": row.category_id},
+            "description": row.description,
+        }
+        for row in rows
+    ]
+
+
+async def budget_categories_by_id(db: AsyncSession, budget_ids: List[UUID]) -> Dict[UUID, List[dict]]:
+    grouped = defaultdict(list)
+    if not budget_ids:
+        return grouped
+    rows = await db.execute(
+        select(budget_categories.c.budget_id, Category.name, Category.description, Category.id)
+        .join(Category, Category.id == budget_categories.c.category_id)
+        .where(budget_categories.c.budget_id.in_(budget_ids))
+    )
+    for row in rows:
+        grouped[row.budget_id].append({"name": row.name, "description": row.description, "id": row.id})
+    return grouped
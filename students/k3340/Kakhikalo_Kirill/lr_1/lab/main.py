@@ -1,34 +1,99 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Literal, Optional
 from uuid import UUID
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import SecretStr
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
 import connections
+import dashboard
+import exporter
+import fastjson
+import group_commit
 import security
 import auth
-from model import User, Account, Category, Transaction, Budget, Target
-from schemas import (UserCreate, UserRead, AccountCreate, AccountRead, CategoryCreate, CategoryRead, TransactionRead,
-                     Token, TransactionWrite, BudgetRead, BudgetCreate, TargetCreate, TargetRead)
+import importer
+import ledger
+import listing
+import metrics
+import pagination
+import progress
+import rates
+import pool_metrics
+import query_budget
+import reports
+import snapshots
+import timing
+import versions
+from model import User, Account, Category, Budget, Target
+from schemas import (UserCreate, UserRead, AccountCreate, AccountRead, CategoryCreate, CategoryRead, TransactionCreated,
+                     TransactionPage, ImportResult, Token, TransactionWrite, BudgetRead,
+                     BudgetCreate, BudgetUsage, MonthlyReportRow, TargetCreate, TargetRead, PoolStatsRead,
+                     ExchangeRateWrite, NetWorth, AccountBalance, BalancePoint, Dashboard)
 
 app = FastAPI()
-
-get_db = connections.get_session
+app.router.route_class = timing.TimedRoute
+
+app.add_middleware(query_budget.QueryBudgetMiddleware)
+app.add_middleware(connections.ReadYourWritesMiddleware)
+app.add_middleware(timing.TimingMiddleware)
+query_budget.install(connections.engine)
+query_budget.install(connections.async_engine.sync_engine)
+timing.install(connections.async_engine.sync_engine)
+if connections.async_read_engine is not connections.async_engine:
+    query_budget.install(connections.async_read_engine.sync_engine)
+    timing.install(connections.async_read_engine.sync_engine)
+
+get_db = connections.get_async_session
+get_read_db = auth.get_read_session
+get_public_read_db = connections.get_read_session
+
+
+@app.exception_handler(security.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: security.HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password operations in progress, try again later"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.on_event("startup")
 def on_startup():
-    connections.init_db()
+    # upcoming partitions and balance snapshots come from `python partitions.py` and
+    # `python snapshots.py` run by cron, not from every worker
+    connections.check_schema()
+
+
+@app.get("/internal/pool", response_model=Dict[str, PoolStatsRead],
+         dependencies=[Depends(auth.require_admin)])
+async def read_pool_stats():
+    return {
+        "async": pool_metrics.snapshot(connections.async_engine.pool),
+        "sync": pool_metrics.snapshot(connections.engine.pool),
+        "read": pool_metrics.snapshot(connections.async_read_engine.pool),
+    }
+
+
+@app.put("/internal/exchange-rates", status_code=204, dependencies=[Depends(auth.require_admin)])
+async def upload_exchange_rates(rates_in: List[ExchangeRateWrite], db: AsyncSession = Depends(get_db)):
+    await rates.upload(db, {rate.currency.upper(): rate.rate for rate in rates_in})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
 ):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -39,54 +104,113 @@ def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.get("/users/me")
-def read_users_me(current_user=Depends(auth.get_current_user)):
+@app.get("/users/me", response_model=UserRead)
+async def read_users_me(current_user=Depends(auth.get_current_user)):
     return current_user
 
 
+@app.get("/users/me/dashboard", response_model=Dashboard)
+@query_budget.query_budget(8)
+async def read_dashboard(
+        transactions: int = Query(dashboard.RECENT_TRANSACTIONS, ge=0, le=dashboard.MAX_RECENT_TRANSACTIONS),
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(auth.get_current_user),
+):
+    return fastjson.FastJSONResponse(await dashboard.dashboard(db, current_user, transactions))
+
+
 @app.get("/users", response_model=List[UserRead])
-def get_all_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+@query_budget.query_budget(2)
+async def get_all_users(request: Request, db: AsyncSession = Depends(get_public_read_db)):
+    return await versions.cached_listing(request, db, versions.USERS, listing.USER_COLUMNS)
 
 
 @app.post("/users", response_model=UserRead, status_code=201)
-def create_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    new_user = User(username=user_in.username, email=user_in.email,
-                    hashed_password=security.hash_password(user_in.password.get_secret_value()))
+async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
+    hashed_password = await security.hash_password_async(user_in.password.get_secret_value())
+    new_user = User(username=user_in.username, email=user_in.email, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await versions.bump(db, versions.USERS)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 @app.post("/users/change_password", response_model=UserRead, status_code=200)
-def change_password(new_password: SecretStr, current_user=Depends(auth.get_current_user),
-                    db: Session = Depends(get_db)):
-    current_user.hashed_password = security.hash_password(new_password.get_secret_value())
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+async def change_password(new_password: SecretStr, current_user=Depends(auth.get_current_user),
+                          db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, current_user.id)
+    user.hashed_password = await security.hash_password_async(new_password.get_secret_value())
+    await db.commit()
+    auth.invalidate_user(user.id)
+    return user
 
 
 @app.get("/accounts", response_model=List[AccountRead])
-def get_all_accounts(current_user=Depends(auth.get_current_user)):
-    return current_user.accounts
+@query_budget.query_budget(2)
+async def get_all_accounts(db: AsyncSession = Depends(get_read_db), current_user=Depends(auth.get_current_user)):
+    return (await db.scalars(select(Account).where(Account.user_id == current_user.id))).all()
 
 
 @app.get("/accounts/{account_id}", response_model=AccountRead)
-def get_account_by_id(account_id: UUID, db: Session = Depends(get_db), current_user=Depends(auth.get_current_user)):
-    account = (
-        db.query(Account)
-        .filter(Account.id == account_id, Account.user_id == current_user.id)
-        .first()
+async def get_account_by_id(account_id: UUID, db: AsyncSession = Depends(get_read_db),
+                            current_user=Depends(auth.get_current_user)):
+    account = await db.scalar(
+        select(Account)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
     )
     if not account:
         raise HTTPException(404, "Account not found")
     return account
 
 
+@app.get("/accounts/{account_id}/balance", response_model=AccountBalance)
+@query_budget.query_budget(6)
+async def read_balance_at(account_id: UUID, at: Optional[datetime] = None, db: AsyncSession = Depends(get_read_db),
+                          current_user=Depends(auth.get_current_user)):
+    balance = await db.scalar(
+        select(Account.balance)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
+    )
+    if balance is None:
+        raise HTTPException(404, "Account not found")
+
+    at = ledger.utc_naive(at) if at else datetime.utcnow()
+    return {"account_id": account_id, "at": at, "balance": await snapshots.balance_at(db, account_id, balance, at)}
+
+
+@app.get("/accounts/{account_id}/balance/history", response_model=List[BalancePoint])
+@query_budget.query_budget(6)
+async def read_balance_history(
+        account_id: UUID,
+        bucket: Literal["day", "week"] = "day",
+        date_from: Optional[date] = Query(None, alias="from"),
+        date_to: Optional[date] = Query(None, alias="to"),
+        db: AsyncSession = Depends(get_read_db),
+        current_user=Depends(auth.get_current_user),
+):
+    balance = await db.scalar(
+        select(Account.balance)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
+    )
+    if balance is None:
+        raise HTTPException(404, "Account not found")
+
+    step = 7 if bucket == "week" else 1
+    date_to = min(date_to or datetime.utcnow().date(), datetime.utcnow().date())
+    date_from = date_from or date_to - timedelta(days=30 * step - 1)
+    if date_from > date_to:
+        raise HTTPException(400, "'from' is after 'to'")
+    if (date_to - date_from).days // step >= snapshots.MAX_POINTS:
+        raise HTTPException(400, f"At most {snapshots.MAX_POINTS} buckets per request")
+    return fastjson.FastJSONResponse(
+        await snapshots.history(db, account_id, balance, date_from, date_to, step)
+    )
+
+
 @app.post("/accounts", response_model=AccountRead, status_code=201)
-def create_account(acct_in: AccountCreate, current_user=Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def create_account(acct_in: AccountCreate, current_user=Depends(auth.get_current_user),
+                         db: AsyncSession = Depends(get_db)):
     new_acct = Account(
         user_id=current_user.id,
         name=acct_in.name,
@@ -94,125 +218,267 @@ def create_account(acct_in: AccountCreate, current_user=Depends(auth.get_current
         currency=acct_in.currency,
     )
     db.add(new_acct)
-    db.commit()
-    db.refresh(new_acct)
+    await db.commit()
+    await db.refresh(new_acct)
     return new_acct
 
 
 @app.post("/categories", response_model=CategoryRead, status_code=201)
-def create_category(cat_in: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(cat_in: CategoryCreate, db: AsyncSession = Depends(get_db)):
     new_cat = Category(name=cat_in.name, description=cat_in.description)
     db.add(new_cat)
-    db.commit()
-    db.refresh(new_cat)
+    await versions.bump(db, versions.CATEGORIES)
+    await db.commit()
+    await db.refresh(new_cat)
     return new_cat
 
 
 @app.get("/categories", response_model=List[CategoryRead])
-def get_all_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+@query_budget.query_budget(2)
+async def get_all_categories(request: Request, db: AsyncSession = Depends(get_public_read_db)):
+    return await versions.cached_listing(request, db, versions.CATEGORIES, listing.CATEGORY_COLUMNS)
+
+
+@app.get("/accounts/{account_id}/transactions", response_model=TransactionPage)
+@query_budget.query_budget(3)
+async def get_transactions_by_account(
+        account_id: UUID,
+        limit: int = Query(pagination.DEFAULT_LIMIT, ge=1, le=pagination.MAX_LIMIT),
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        category_id: Optional[UUID] = None,
+        min_amount: Optional[int] = None,
+        max_amount: Optional[int] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user=Depends(auth.get_current_user),
+):
+    account = await db.scalar(
+        select(Account)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
+    )
+    if not account:
+        raise HTTPException(404, "Account not found")
+
+    history = listing.TRANSACTION_HISTORY.c
+    query = listing.TRANSACTION_COLUMNS.where(history.account_id == account.id)
+    if date_from is not None:
+        query = query.filter(history.timestamp >= ledger.utc_naive(date_from))
+    if date_to is not None:
+        query = query.filter(history.timestamp < ledger.utc_naive(date_to))
+    if category_id is not None:
+        query = query.filter(history.category_id == category_id)
+    if min_amount is not None:
+        query = query.filter(history.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(history.amount <= max_amount)
+
+    rows = (await db.execute(pagination.keyset(query, limit, after, before))).all()
+    result = pagination.page(rows, limit, after, before)
+    result["items"] = listing.transaction_rows(result["items"])
+    return fastjson.FastJSONResponse(result)
+
+
+@app.post("/accounts/{account_id}/transactions", response_model=TransactionCreated, status_code=201)
+async def create_transaction(account_id: UUID, transaction_in: TransactionWrite, db: AsyncSession = Depends(get_db),
+                             current_user=Depends(auth.get_current_user)):
+    def post(session: AsyncSession):
+        return ledger.post_transaction(session, current_user.id, account_id, transaction_in.category_id,
+                                       transaction_in.amount, transaction_in.description)
+
+    if group_commit.committer is not None:
+        # the posting runs on the batch's session; don't hold this one's connection while waiting
+        await db.commit()
+        with timing.phase("commit_wait"):
+            new_transaction = await group_commit.committer.submit(account_id, post)
+        connections.mark_write(current_user.id)
+        return new_transaction
+
+    new_transaction = await post(db)
+    await db.commit()
+    return new_transaction
 
 
-@app.get("/accounts/{account_id}/transactions", response_model=List[TransactionRead])
-def get_transactions_by_account(
-        account_id: UUID, db: Session = Depends(get_db), current_user=Depends(auth.get_current_user)
-):
-    account = (
-        db.query(Account)
-        .filter(Account.id == account_id, Account.user_id == current_user.id)
-        .first()
+@app.post("/accounts/{account_id}/transactions/import", response_model=ImportResult, status_code=200)
+async def import_transactions(account_id: UUID, request: Request, db: AsyncSession = Depends(get_db),
+                              current_user=Depends(auth.get_current_user)):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in importer.CSV_TYPES + importer.NDJSON_TYPES:
+        raise HTTPException(415, "Expected text/csv or application/x-ndjson body")
+
+    account = await db.scalar(
+        select(Account)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
     )
     if not account:
         raise HTTPException(404, "Account not found")
-    return account.transactions
 
+    return await importer.import_transactions(db, account, content_type, request.stream())
+
+
+@app.get("/accounts/{account_id}/transactions/export", response_class=StreamingResponse)
+@query_budget.query_budget(3)
+async def export_transactions(request: Request, account_id: UUID, format: Literal["csv", "ndjson"] = "csv",
+                              db: AsyncSession = Depends(get_read_db), current_user=Depends(auth.get_current_user)):
+    account_exists = await db.scalar(
+        select(Account.id)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
+    )
+    if not account_exists:
+        raise HTTPException(404, "Account not found")
+    # the export reads through its own session, don't keep this one's connection checked out meanwhile
+    await db.commit()
+
+    return StreamingResponse(
+        exporter.export_transactions(account_id, format, auth.read_sessionmaker(request, current_user)),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions-{account_id}.{format}"'},
+    )
 
-@app.post("/accounts/{account_id}/transactions", response_model=TransactionRead, status_code=201)
-def create_transaction(account_id: UUID, transaction_in: TransactionWrite, db: Session = Depends(get_db),
-                       current_user=Depends(auth.get_current_user)):
-    account = (
-        db.query(Account)
-        .filter(Account.id == account_id, Account.user_id == current_user.id)
-        .first()
+
+@app.get("/accounts/{account_id}/reports/monthly", response_model=List[MonthlyReportRow])
+@query_budget.query_budget(4)
+async def read_account_monthly_report(
+        account_id: UUID,
+        month_from: Optional[str] = Query(None, alias="from"),
+        month_to: Optional[str] = Query(None, alias="to"),
+        db: AsyncSession = Depends(get_read_db),
+        current_user=Depends(auth.get_current_user),
+):
+    account = await db.scalar(
+        select(Account)
+        .where(Account.id == account_id, Account.user_id == current_user.id)
     )
     if not account:
         raise HTTPException(404, "Account not found")
 
-    new_transaction = Transaction(
-        account_id=account.id,
-        amount=transaction_in.amount,
-        timestamp=datetime.utcnow(),
-        category_id=transaction_in.category_id,
-        description=transaction_in.description
+    rows = await reports.monthly(
+        db, ("account", account.id), Account.id == account.id,
+        reports.parse_month(month_from) if month_from else None,
+        reports.parse_month(month_to) if month_to else None,
     )
+    return fastjson.FastJSONResponse(rows)
 
-    if account.balance + transaction_in.amount < 0:
-        raise HTTPException(400, "Not enough money")
 
-    db.add(new_transaction)
-    account.balance += transaction_in.amount
-    db.commit()
-    db.refresh(new_transaction)
-    return new_transaction
+@app.get("/users/me/reports/monthly", response_model=List[MonthlyReportRow])
+@query_budget.query_budget(5)
+async def read_user_monthly_report(
+        month_from: Optional[str] = Query(None, alias="from"),
+        month_to: Optional[str] = Query(None, alias="to"),
+        currency: Optional[str] = Query(None, min_length=3, max_length=3),
+        db: AsyncSession = Depends(get_read_db),
+        current_user=Depends(auth.get_current_user),
+):
+    rows = await reports.monthly(
+        db, ("user", current_user.id), Account.user_id == current_user.id,
+        reports.parse_month(month_from) if month_from else None,
+        reports.parse_month(month_to) if month_to else None,
+    )
+    if currency:
+        rows = rates.convert_rows(rows, await rates.conversion_matrix(db), currency.upper(),
+                                  key=("month", "category_id"), amounts=("income", "expense", "net"))
+    return fastjson.FastJSONResponse(rows)
+
+
+@app.get("/users/me/net-worth", response_model=NetWorth)
+@query_budget.query_budget(4)
+async def read_net_worth(currency: str = Query(..., min_length=3, max_length=3),
+                         db: AsyncSession = Depends(get_read_db), current_user=Depends(auth.get_current_user)):
+    return await rates.net_worth(db, current_user.id, currency.upper())
 
 
 @app.get("/budgets", response_model=List[BudgetRead], status_code=200)
-def read_budgets(db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    budgets = (
-        db.query(Budget)
+@query_budget.query_budget(4)
+async def read_budgets(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(auth.get_current_user)):
+    budgets = listing.plain(await db.execute(listing.BUDGET_COLUMNS.where(Account.user_id == current_user.id)))
+    budget_ids = [budget["id"] for budget in budgets]
+
+    categories = await listing.budget_categories_by_id(db, budget_ids)
+    spent = await ledger.budget_spent(db, budget_ids)
+    for budget in budgets:
+        budget["categories"] = categories[budget["id"]]
+        budget["spent"] = spent[budget["id"]]
+    return fastjson.FastJSONResponse(budgets)
+
+
+@app.get("/budgets/{budget_id}/usage", response_model=BudgetUsage, status_code=200)
+@query_budget.query_budget(3)
+async def read_budget_usage(budget_id: UUID, db: AsyncSession = Depends(get_read_db),
+                            current_user: User = Depends(auth.get_current_user)):
+    budget = await db.scalar(
+        select(Budget)
         .join(Account)
-        .filter(Account.user_id == current_user.id)
-        .all()
+        .where(Budget.id == budget_id, Account.user_id == current_user.id)
     )
+    if not budget:
+        raise HTTPException(404, "Budget not found")
 
-    return budgets
+    spent = (await ledger.budget_spent(db, [budget.id]))[budget.id]
+    return BudgetUsage(
+        budget_id=budget.id,
+        limit=budget.limit,
+        spent=spent,
+        remaining=budget.limit - spent,
+        exceeded=spent > budget.limit,
+    )
 
 
 @app.post("/budgets", response_model=BudgetRead, status_code=201)
-def create_budget(budget_in: BudgetCreate, db: Session = Depends(get_db),
-                  current_user: User = Depends(auth.get_current_user)):
-    account = db.get(Account, budget_in.account_id)
+async def create_budget(budget_in: BudgetCreate, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth.get_current_user)):
+    account = await db.get(Account, budget_in.account_id)
     if not account or account.user_id != current_user.id:
         raise HTTPException(404, "Account not found")
 
+    categories = []
+    if budget_in.category_ids:
+        categories = (await db.scalars(select(Category).where(Category.id.in_(budget_in.category_ids)))).all()
+        if len(categories) != len(set(budget_in.category_ids)):
+            raise HTTPException(404, "Category not found")
+
     new_budget = Budget(
         account_id=budget_in.account_id,
         limit=budget_in.limit,
         start_date=budget_in.start_date,
         end_date=budget_in.end_date,
+        categories=categories,
     )
     db.add(new_budget)
-    db.commit()
-    db.refresh(new_budget)
+    await db.commit()
+    await db.refresh(new_budget, ["categories"])
     return new_budget
 
 
 @app.delete("/budgets/{budget_id}", status_code=200)
-def delete_budget(budget_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    budget = db.query(Budget).get(budget_id)
-    if not budget or budget.account.user_id != current_user.id:
+async def delete_budget(budget_id: UUID, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth.get_current_user)):
+    budget = await db.scalar(
+        select(Budget)
+        .join(Account)
+        .where(Budget.id == budget_id, Account.user_id == current_user.id)
+    )
+    if not budget:
         raise HTTPException(404, "Budget not found")
 
-    db.delete(budget)
-    db.commit()
+    await db.delete(budget)
+    await db.commit()
     return
 
 
 @app.get("/targets", response_model=List[TargetRead], status_code=200)
-def read_targets(db: Session = Depends(get_db), current_user: User = Depends(auth.get_current_user)):
-    targets = (
-        db.query(Target)
-        .join(Account)
-        .filter(Account.user_id == current_user.id)
-        .all()
-    )
-    return targets
+@query_budget.query_budget(3)
+async def read_targets(db: AsyncSession = Depends(get_read_db), current_user: User = Depends(auth.get_current_user)):
+    targets = listing.plain(await db.execute(listing.TARGET_COLUMNS.where(Account.user_id == current_user.id)))
+    accounts = {target["account_id"]: target["account_updated_at"] for target in targets}
+    progress.annotate(targets, await progress.average_daily_net(db, accounts))
+    return fastjson.FastJSONResponse(targets)
 
 
 @app.post("/targets", response_model=TargetRead, status_code=201)
-def create_target(target_in: TargetCreate, db: Session = Depends(get_db),
-                  current_user: User = Depends(auth.get_current_user)):
-    account = db.get(Account, target_in.account_id)
+async def create_target(target_in: TargetCreate, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth.get_current_user)):
+    account = await db.get(Account, target_in.account_id)
     if not account or account.user_id != current_user.id:
         raise HTTPException(404, "Account not found")
 
@@ -225,18 +491,22 @@ def create_target(target_in: TargetCreate, db: Session = Depends(get_db),
         created_at=datetime.utcnow()
     )
     db.add(new_target)
-    db.commit()
-    db.refresh(new_target)
+    await db.commit()
+    await db.refresh(new_target)
     return new_target
 
 
 @app.delete("/targets/{target_id}", status_code=200)
-def delete_target(target_id: UUID, db: Session = Depends(get_db),
-                  current_user: User = Depends(auth.get_current_user), ):
-    target = db.query(Target).get(target_id)
-    if not target or target.account.user_id != current_user.id:
+async def delete_target(target_id: UUID, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth.get_current_user), ):
+    target = await db.scalar(
+        select(Target)
+        .join(Account)
+        .where(Target.id == target_id, Account.user_id == current_user.id)
+    )
+    if not target:
         raise HTTPException(404, "Target not found")
 
-    db.delete(target)
-    db.commit()
+    await db.delete(target)
+    await db.commit()
     return
@@ -0,0 +1,65 @@
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Minimal Prometheus histogram, enough for the text exposition format."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts, +Inf count, sum
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total, value_sum) for labels, (counts, total, value_sum) in self._series.items()}
+        for labels, (counts, total, value_sum) in sorted(series.items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {total}')
+            lines.append(f"{self.name}_sum{{{base}}} {value_sum}")
+            lines.append(f"{self.name}_count{{{base}}} {total}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time spent in the route handler.", ("method", "route", "status"),
+)
+request_phase_duration = Histogram(
+    "http_request_phase_duration_seconds", "Time per request phase: jwt, user, db, serialize.", ("route", "phase"),
+)
+
+REGISTRY = (request_duration, request_phase_duration)
+
+
+def render() -> str:
+    lines = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
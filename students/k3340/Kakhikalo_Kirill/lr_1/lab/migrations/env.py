@@ -19,6 +19,7 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from model import Base
+from partitions import include_name
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -30,11 +31,15 @@ import os
 from alembic import context
 from dotenv import load_dotenv
 
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
-db_url = os.getenv("DB_ADMIN")
-if not db_url:
-    raise RuntimeError("DB_ADMIN")
-context.config.set_main_option("sqlalchemy.url", db_url)
+# callers such as schema_check.py hand over an open connection instead of a URL
+shared_connection = config.attributes.get("connection")
+
+if shared_connection is None:
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+    db_url = os.getenv("DB_ADMIN")
+    if not db_url:
+        raise RuntimeError("DB_ADMIN")
+    context.config.set_main_option("sqlalchemy.url", db_url)
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -52,6 +57,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -67,6 +73,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    if shared_connection is not None:
+        context.configure(
+            connection=shared_connection, target_metadata=target_metadata, include_name=include_name
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -75,7 +89,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
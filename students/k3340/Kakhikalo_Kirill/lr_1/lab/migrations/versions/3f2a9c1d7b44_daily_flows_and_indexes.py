@@ -0,0 +1,60 @@
+"""daily flows and indexes
+
+Revision ID: 3f2a9c1d7b44
+Revises: 95e95c868441
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b44'
+down_revision: Union[str, None] = '95e95c868441'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "daily_flows",
+        sa.Column("account_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("category_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("inflow", sa.Integer(), nullable=False),
+        sa.Column("outflow", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"]),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+        sa.PrimaryKeyConstraint("account_id", "category_id", "day"),
+    )
+    day = "date(timestamp)" if op.get_bind().dialect.name == "sqlite" else "CAST(timestamp AS DATE)"
+    op.execute(
+        "INSERT INTO daily_flows (account_id, category_id, day, inflow, outflow) "
+        f"SELECT account_id, category_id, {day}, "
+        "SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), "
+        "SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END) "
+        f"FROM transactions GROUP BY account_id, category_id, {day}"
+    )
+
+    op.create_index("ix_transactions_account_timestamp_id", "transactions", ["account_id", "timestamp", "id"])
+    op.create_index("ix_transactions_category_id", "transactions", ["category_id"])
+    op.create_index("ix_accounts_user_id", "accounts", ["user_id"])
+    op.create_index("ix_budgets_account_id", "budgets", ["account_id"])
+    op.create_index("ix_targets_account_id", "targets", ["account_id"])
+    op.create_index("ix_budget_categories_category_id", "budget_categories", ["category_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_budget_categories_category_id", table_name="budget_categories")
+    op.drop_index("ix_targets_account_id", table_name="targets")
+    op.drop_index("ix_budgets_account_id", table_name="budgets")
+    op.drop_index("ix_accounts_user_id", table_name="accounts")
+    op.drop_index("ix_transactions_category_id", table_name="transactions")
+    op.drop_index("ix_transactions_account_timestamp_id", table_name="transactions")
+    op.drop_table("daily_flows")
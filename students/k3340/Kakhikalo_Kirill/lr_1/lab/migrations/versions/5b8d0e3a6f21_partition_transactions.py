@@ -0,0 +1,118 @@
+"""partition transactions by month
+
+Revision ID: 5b8d0e3a6f21
+Revises: e91b6a0f3c58
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d0e3a6f21'
+down_revision: Union[str, None] = 'e91b6a0f3c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = partitions.COLUMNS
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "transactions_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("account_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("category_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"]),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transactions_archive_account_timestamp", "transactions_archive", ["account_id", "timestamp"])
+    op.create_index("ix_transactions_archive_timestamp", "transactions_archive", ["timestamp"],
+                    postgresql_using="brin")
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _partition_transactions(bind)
+
+    op.execute(
+        f"CREATE VIEW transactions_all AS SELECT {COLUMNS} FROM transactions "
+        f"UNION ALL SELECT {COLUMNS} FROM transactions_archive"
+    )
+
+
+def _partition_transactions(bind) -> None:
+    # the partition key has to be part of the primary key, so the table is rebuilt
+    op.execute("ALTER TABLE transactions RENAME TO transactions_heap")
+    op.execute("ALTER TABLE transactions_heap RENAME CONSTRAINT transactions_pkey TO transactions_heap_pkey")
+    op.drop_index("ix_transactions_account_timestamp_id", table_name="transactions_heap")
+    op.drop_index("ix_transactions_category_id", table_name="transactions_heap")
+
+    op.execute(
+        "CREATE TABLE transactions ("
+        " id UUID NOT NULL,"
+        " account_id UUID NOT NULL REFERENCES accounts (id),"
+        " amount INTEGER NOT NULL,"
+        " timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+        " category_id UUID NOT NULL REFERENCES categories (id),"
+        " description VARCHAR,"
+        " PRIMARY KEY (id, timestamp)"
+        ") PARTITION BY RANGE (timestamp)"
+    )
+    op.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF transactions DEFAULT")
+
+    oldest = bind.scalar(sa.text("SELECT min(timestamp) FROM transactions_heap")) or datetime.utcnow()
+    this_month = datetime.utcnow().date().replace(day=1)
+    partitions.ensure_partitions(bind, oldest.date().replace(day=1),
+                                 partitions.add_months(this_month, partitions.MONTHS_AHEAD))
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_heap")
+    op.execute("DROP TABLE transactions_heap")
+    op.create_index("ix_transactions_account_timestamp_id", "transactions", ["account_id", "timestamp", "id"])
+    op.create_index("ix_transactions_category_id", "transactions", ["category_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP VIEW transactions_all")
+
+    bind = op.get_bind()
+    if partitions.is_partitioned(bind):
+        op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+        op.drop_index("ix_transactions_account_timestamp_id", table_name="transactions_partitioned")
+        op.drop_index("ix_transactions_category_id", table_name="transactions_partitioned")
+        op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey "
+                   "TO transactions_partitioned_pkey")
+        op.execute(
+            "CREATE TABLE transactions ("
+            " id UUID PRIMARY KEY,"
+            " account_id UUID NOT NULL REFERENCES accounts (id),"
+            " amount INTEGER NOT NULL,"
+            " timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,"
+            " category_id UUID NOT NULL REFERENCES categories (id),"
+            " description VARCHAR"
+            ")"
+        )
+        op.execute(
+            f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned "
+            f"UNION ALL SELECT {COLUMNS} FROM transactions_archive"
+        )
+        # dropping the parent drops every partition with it
+        op.execute("DROP TABLE transactions_partitioned")
+        op.create_index("ix_transactions_account_timestamp_id", "transactions", ["account_id", "timestamp", "id"])
+        op.create_index("ix_transactions_category_id", "transactions", ["category_id"])
+
+    op.drop_index("ix_transactions_archive_timestamp", table_name="transactions_archive")
+    op.drop_index("ix_transactions_archive_account_timestamp", table_name="transactions_archive")
+    op.drop_table("transactions_archive")
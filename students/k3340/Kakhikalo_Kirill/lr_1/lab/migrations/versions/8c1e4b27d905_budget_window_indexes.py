@@ -0,0 +1,32 @@
+"""budget window indexes
+
+Revision ID: 8c1e4b27d905
+Revises: 3f2a9c1d7b44
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1e4b27d905'
+down_revision: Union[str, None] = '3f2a9c1d7b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_budgets_account_window", "budgets", ["account_id", "end_date", "start_date"])
+    # the composite index covers lookups by category_id alone as well
+    op.drop_index("ix_budget_categories_category_id", table_name="budget_categories")
+    op.create_index("ix_budget_categories_category_budget", "budget_categories", ["category_id", "budget_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_budget_categories_category_budget", table_name="budget_categories")
+    op.create_index("ix_budget_categories_category_id", "budget_categories", ["category_id"])
+    op.drop_index("ix_budgets_account_window", table_name="budgets")
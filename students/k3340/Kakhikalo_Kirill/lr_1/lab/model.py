@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import (Column, String, Integer, DateTime, Table, ForeignKey, UniqueConstraint)
+from sqlalchemy import (Column, String, Integer, Float, Date, DateTime, Table, ForeignKey, Index, UniqueConstraint)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -11,7 +11,8 @@ budget_categories = Table(
     Base.metadata,
     Column("budget_id", UUID(as_uuid=True), ForeignKey("budgets.id"), primary_key=True),
     Column("category_id", UUID(as_uuid=True), ForeignKey("categories.id"), primary_key=True),
-    UniqueConstraint("budget_id", "category_id", name="uq_budget_category")
+    UniqueConstraint("budget_id", "category_id", name="uq_budget_category"),
+    Index("ix_budget_categories_category_budget", "category_id", "budget_id"),
 )
 
 
@@ -31,7 +32,7 @@ class Account(Base):
     __tablename__ = "accounts"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     balance = Column(Integer, nullable=False, default=0)
     currency = Column(String(3), nullable=False)
@@ -57,9 +58,13 @@ class Category(Base):
 
 class Budget(Base):
     __tablename__ = "budgets"
+    __table_args__ = (
+        # expired budgets sort before any new timestamp, so the range scan skips them
+        Index("ix_budgets_account_window", "account_id", "end_date", "start_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False, index=True)
     limit = Column(Integer, nullable=False)
     start_date = Column(DateTime, nullable=False)
     end_date = Column(DateTime, nullable=False)
@@ -70,23 +75,42 @@ class Budget(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_account_timestamp_id", "account_id", "timestamp", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
     amount = Column(Integer, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
-    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False, index=True)
     description = Column(String, nullable=True)
 
     account = relationship("Account", back_populates="transactions")
     category = relationship("Category", back_populates="transactions")
 
 
+# partitions older than ARCHIVE_AFTER_MONTHS end up here, see partitions.py; the
+# transactions_all view and listing.TRANSACTION_HISTORY read this and the live table together
+transactions_archive = Table(
+    "transactions_archive",
+    Base.metadata,
+    Column("id", UUID(as_uuid=True), primary_key=True),
+    Column("account_id", UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False),
+    Column("amount", Integer, nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+    Column("category_id", UUID(as_uuid=True), ForeignKey("categories.id"), nullable=False),
+    Column("description", String, nullable=True),
+    Index("ix_transactions_archive_account_timestamp", "account_id", "timestamp"),
+    Index("ix_transactions_archive_timestamp", "timestamp", postgresql_using="brin"),
+)
+
+
 class Target(Base):
     __tablename__ = "targets"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     target_amount = Column(Integer, nullable=False)
     deadline = Column(DateTime, nullable=False)
@@ -94,3 +118,40 @@ class Target(Base):
     description = Column(String, nullable=True)
 
     account = relationship("Account", back_populates="targets")
+
+
+class DailyFlow(Base):
+    """Per account, category and day totals, kept up to date by every transaction write."""
+    __tablename__ = "daily_flows"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    inflow = Column(Integer, nullable=False, default=0)
+    outflow = Column(Integer, nullable=False, default=0)
+
+
+class ResourceVersion(Base):
+    """Change counter per cacheable collection, bumped in the same transaction as the write."""
+    __tablename__ = "resource_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class ExchangeRate(Base):
+    """Value of one unit of `currency` in the common pivot currency, uploaded by an admin."""
+    __tablename__ = "exchange_rates"
+
+    currency = Column(String(3), primary_key=True)
+    rate = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class BalanceSnapshot(Base):
+    """Balance at the end of `day`, written by the compaction job in snapshots.py."""
+    __tablename__ = "balance_snapshots"
+
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    balance = Column(Integer, nullable=False)
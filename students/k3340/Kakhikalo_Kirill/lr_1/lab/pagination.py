@@ -0,0 +1,68 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from listing import TRANSACTION_HISTORY as history
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(timestamp: datetime, row_id: UUID) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        timestamp, row_id = datetime.fromisoformat(timestamp), UUID(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(400, "Invalid cursor")
+    # we only ever issue naive UTC timestamps, an offset means the cursor was made up
+    if timestamp.tzinfo is not None:
+        raise HTTPException(400, "Invalid cursor")
+    return timestamp, row_id
+
+
+def keyset(query, limit: int, after: Optional[str] = None, before: Optional[str] = None):
+    """Newest first. `after` walks to older rows, `before` walks back to newer ones."""
+    if after and before:
+        raise HTTPException(400, "Use either 'after' or 'before', not both")
+
+    key = tuple_(history.c.timestamp, history.c.id)
+    # the plain timestamp bound is redundant with the row comparison, but it is what lets
+    # Postgres prune the monthly partitions on the far side of the cursor
+    if before:
+        cursor = decode_cursor(before)
+        query = query.filter(history.c.timestamp >= cursor[0], key > cursor)
+        query = query.order_by(history.c.timestamp.asc(), history.c.id.asc())
+    else:
+        if after:
+            cursor = decode_cursor(after)
+            query = query.filter(history.c.timestamp <= cursor[0], key < cursor)
+        query = query.order_by(history.c.timestamp.desc(), history.c.id.desc())
+    # one extra row tells us whether there is another page
+    return query.limit(limit + 1)
+
+
+def page(rows: list, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> dict:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if has_more or before:
+            next_cursor = encode_cursor(last.timestamp, last.id)
+        if (before and has_more) or after:
+            prev_cursor = encode_cursor(first.timestamp, first.id)
+    return {"items": rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
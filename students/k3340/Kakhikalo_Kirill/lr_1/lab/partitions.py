@@ -0,0 +1,150 @@
+"""Monthly range partitions of `transactions` on Postgres, and archival of the old ones.
+
+    python partitions.py              # create upcoming partitions, archive expired ones
+
+Meant to run from cron (daily is plenty). On SQLite `transactions` stays a plain table and
+this is a no-op.
+"""
+import os
+import re
+from datetime import date, datetime
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", 24))
+
+DEFAULT_PARTITION = "transactions_default"
+# serializes concurrent runs (cron overlapping a migration, a manual run); any constant works
+LOCK_KEY = 0x7472616e73
+_PARTITION_NAME = re.compile(r"^transactions_(y\d{4}m\d{2}|default)$")
+
+COLUMNS = "id, account_id, amount, timestamp, category_id, description"
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Alembic filter: partitions are managed here, not described in model.py."""
+    return not (type_ == "table" and _PARTITION_NAME.match(name or ""))
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"transactions_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.scalar(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('transactions')"
+    )))
+
+
+def monthly_partitions(conn: Connection) -> List[date]:
+    names = conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('transactions')"
+    ))
+    return sorted(date(int(name[14:18]), int(name[19:21]), 1) for name in names if name != DEFAULT_PARTITION)
+
+
+def create_partition(conn: Connection, month: date):
+    """Creates the month's partition, moving any of its rows out of the default partition first."""
+    name, start, end = partition_name(month), month, add_months(month, 1)
+    bounds = {"start": datetime.combine(start, datetime.min.time()), "end": datetime.combine(end, datetime.min.time())}
+    strays = conn.scalar(text(
+        f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"
+    ), bounds)
+    if not strays:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF transactions FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+        return
+    # a new partition may not overlap rows still sitting in the default one
+    conn.execute(text(f"ALTER TABLE transactions DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF transactions FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM {DEFAULT_PARTITION} "
+        "WHERE timestamp >= :start AND timestamp < :end"
+    ), bounds)
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end"), bounds)
+    conn.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+
+def lock(conn: Connection):
+    """Held until the transaction ends; whoever waited re-reads the catalog afterwards."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+
+
+def ensure_partitions(conn: Connection, first: date, last: date) -> List[str]:
+    lock(conn)
+    existing = set(monthly_partitions(conn))
+    created = []
+    month = first
+    while month <= last:
+        if month not in existing:
+            create_partition(conn, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def archive_partitions(conn: Connection, before: date) -> List[str]:
+    """Folds every partition that ends on or before `before` into transactions_archive.
+
+    The archive is one append-only heap sorted by account and time with a BRIN index on
+    timestamp, far smaller than the partitions' B-trees. transactions_all reads both.
+    """
+    lock(conn)
+    archived = []
+    for month in monthly_partitions(conn):
+        if add_months(month, 1) > before:
+            break
+        name = partition_name(month)
+        conn.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+        conn.execute(text(
+            f"INSERT INTO transactions_archive ({COLUMNS}) SELECT {COLUMNS} FROM {name} "
+            "ORDER BY account_id, timestamp"
+        ))
+        conn.execute(text(f"DROP TABLE {name}"))
+        archived.append(name)
+    return archived
+
+
+def ensure_upcoming(conn: Connection) -> List[str]:
+    """This month and the next MONTHS_AHEAD, so new rows never land in the default partition."""
+    if not is_partitioned(conn):
+        return []
+    this_month = datetime.utcnow().date().replace(day=1)
+    return ensure_partitions(conn, this_month, add_months(this_month, MONTHS_AHEAD))
+
+
+def maintain(conn: Connection) -> dict:
+    if not is_partitioned(conn):
+        return {"created": [], "archived": []}
+    this_month = datetime.utcnow().date().replace(day=1)
+    return {
+        "created": ensure_upcoming(conn),
+        "archived": archive_partitions(conn, add_months(this_month, -ARCHIVE_AFTER_MONTHS)),
+    }
+
+
+def main():
+    import connections
+
+    with connections.engine.begin() as conn:
+        result = maintain(conn)
+    print(f"created: {', '.join(result['created']) or '-'}")
+    print(f"archived: {', '.join(result['archived']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
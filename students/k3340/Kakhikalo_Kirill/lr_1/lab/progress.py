@@ -0,0 +1,65 @@
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from model import DailyFlow
+
+WINDOW_DAYS = int(os.getenv("TARGET_WINDOW_DAYS", 90))
+
+# account id -> (account.updated_at, average daily net flow); every balance change moves updated_at
+_net_flow = TTLCache(maxsize=int(os.getenv("TARGET_CACHE_SIZE", 10000)), ttl=24 * 3600)
+
+
+async def average_daily_net(db: AsyncSession, accounts: Dict[UUID, datetime]) -> Dict[UUID, float]:
+    """Mean net inflow per day over the last WINDOW_DAYS, one grouped query for every stale account."""
+    result, stale = {}, []
+    for account_id, updated_at in accounts.items():
+        cached = _net_flow.get(account_id)
+        if cached is not None and cached[0] == updated_at:
+            result[account_id] = cached[1]
+        else:
+            stale.append(account_id)
+
+    if stale:
+        since = datetime.utcnow().date() - timedelta(days=WINDOW_DAYS)
+        totals = dict((await db.execute(
+            select(DailyFlow.account_id, func.sum(DailyFlow.inflow - DailyFlow.outflow))
+            .where(DailyFlow.account_id.in_(stale), DailyFlow.day > since)
+            .group_by(DailyFlow.account_id)
+        )).all())
+        for account_id in stale:
+            result[account_id] = (totals.get(account_id) or 0) / WINDOW_DAYS
+            _net_flow.set(account_id, (accounts[account_id], result[account_id]))
+    return result
+
+
+def annotate(targets: List[dict], daily_net: Dict[UUID, float]):
+    """Adds progress fields to target rows that carry current_amount and account_updated_at."""
+    now = datetime.utcnow()
+    for target in targets:
+        target.pop("account_updated_at")
+        current, goal = target["current_amount"], target["target_amount"]
+        remaining = max(goal - current, 0)
+        days_left = (target["deadline"] - now).total_seconds() / 86400
+        net = daily_net[target["account_id"]]
+
+        if remaining == 0:
+            projected = now
+        elif net > 0 and remaining / net <= days_left:
+            projected = now + timedelta(days=remaining / net)
+        else:
+            # a trickle against a large goal can project past datetime.max, so nothing past the deadline is built
+            projected = None
+
+        target["remaining"] = remaining
+        target["progress"] = min(current / goal, 1.0) if goal > 0 else 1.0
+        target["required_daily"] = math.ceil(remaining / days_left) if days_left >= 1 else remaining
+        target["average_daily_net"] = net
+        target["projected_completion"] = projected
+        target["on_track"] = projected is not None and projected <= target["deadline"]
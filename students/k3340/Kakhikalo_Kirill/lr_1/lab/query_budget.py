@@ -0,0 +1,55 @@
+import contextvars
+import logging
+import os
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# QUERY_BUDGET_ENFORCE=1 (set by tests/test_query_budget.py) turns a blown budget into an error
+ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE") == "1"
+
+_counter = contextvars.ContextVar("query_counter", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit: int):
+    """Declare how many SQL statements one call of the endpoint may issue."""
+    def decorator(func):
+        func.query_budget = limit
+        return func
+    return decorator
+
+
+def install(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        counter = [0]
+        token = _counter.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _counter.reset(token)
+
+        limit = getattr(scope.get("endpoint"), "query_budget", None)
+        if limit is not None and counter[0] > limit:
+            message = f"{scope['method']} {scope['path']} ran {counter[0]} queries, budget is {limit}"
+            if ENFORCE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
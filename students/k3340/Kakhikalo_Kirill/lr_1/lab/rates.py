@@ -0,0 +1,104 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import ledger
+import versions
+from cache import TTLCache
+from model import Account, ExchangeRate
+
+Matrix = Dict[str, Dict[str, float]]
+
+# (version, matrix); rebuilt only after an upload bumps the version
+_matrix = TTLCache(maxsize=1, ttl=24 * 3600)
+
+
+def build_matrix(rates: Dict[str, float]) -> Matrix:
+    """Every pair at once: rates are quoted against one pivot, so a -> b is rate[a] / rate[b]."""
+    return {src: {dst: rates[src] / rates[dst] for dst in rates} for src in rates}
+
+
+async def conversion_matrix(db: AsyncSession) -> Matrix:
+    version = await versions.current(db, versions.EXCHANGE_RATES)
+    cached = _matrix.get(versions.EXCHANGE_RATES)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    rates = dict((await db.execute(select(ExchangeRate.currency, ExchangeRate.rate))).all())
+    matrix = build_matrix(rates)
+    _matrix.set(versions.EXCHANGE_RATES, (version, matrix))
+    return matrix
+
+
+def factors(matrix: Matrix, currencies: Iterable[str], target: str) -> Dict[str, float]:
+    """Conversion factor into `target` for each currency, 400 when one has no rate."""
+    currencies = set(currencies)
+    unknown = sorted(c for c in currencies | {target} if c not in matrix)
+    if unknown:
+        raise HTTPException(400, f"No exchange rate for {', '.join(unknown)}")
+    return {currency: matrix[currency][target] for currency in currencies}
+
+
+def convert_rows(rows: List[dict], matrix: Matrix, target: str, key: Sequence[str],
+                 amounts: Sequence[str]) -> List[dict]:
+    """Merges grouped rows that differ only in currency, converting `amounts` into `target`.
+
+    Works for any report already aggregated per currency in SQL, so the conversion is one pass over
+    the groups rather than over the underlying transactions.
+    """
+    factor = factors(matrix, (row["currency"] for row in rows), target)
+    merged: Dict[tuple, dict] = {}
+    totals = defaultdict(float)
+    for row in rows:
+        group = tuple(row[name] for name in key)
+        merged.setdefault(group, {**row, "currency": target})
+        for name in amounts:
+            totals[group, name] += row[name] * factor[row["currency"]]
+    for group, row in merged.items():
+        for name in amounts:
+            row[name] = round(totals[group, name])
+    return list(merged.values())
+
+
+async def upload(db: AsyncSession, rates: Dict[str, float]):
+    if not rates:
+        raise HTTPException(400, "No rates given")
+    if any(len(currency) != 3 for currency in rates):
+        raise HTTPException(400, "Currency codes must have 3 letters")
+    # NaN compares False with everything, so it has to be ruled out explicitly
+    if any(not math.isfinite(rate) or rate <= 0 for rate in rates.values()):
+        raise HTTPException(400, "Rates must be positive finite numbers")
+    stmt = ledger.dialect_insert(db)(ExchangeRate).values(
+        [{"currency": currency, "rate": rate} for currency, rate in rates.items()]
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ExchangeRate.currency],
+        set_={"rate": stmt.excluded.rate, "updated_at": datetime.utcnow()},
+    ))
+    await versions.bump(db, versions.EXCHANGE_RATES)
+    await db.commit()
+
+
+async def net_worth(db: AsyncSession, user_id, target: str) -> dict:
+    # accounts keep the code as the client sent it, rates are stored upper-case
+    currency = func.upper(Account.currency)
+    balances = dict((await db.execute(
+        select(currency, func.sum(Account.balance))
+        .where(Account.user_id == user_id)
+        .group_by(currency)
+    )).all())
+    matrix = await conversion_matrix(db)
+    factor = factors(matrix, balances, target)
+    by_currency = [
+        {"currency": currency, "balance": balance, "converted": round(balance * factor[currency])}
+        for currency, balance in sorted(balances.items())
+    ]
+    return {
+        "currency": target,
+        "total": sum(item["converted"] for item in by_currency),
+        "by_currency": by_currency,
+    }
@@ -0,0 +1,108 @@
+import os
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import versions
+from cache import TTLCache
+from model import Account, Category, DailyFlow
+
+# scope -> (history version, {month: rows}); closed months only change when a back-dated import
+# lands in them and bumps the version, the TTL is just a memory bound
+_closed_months = TTLCache(maxsize=int(os.getenv("REPORT_CACHE_SIZE", 10000)),
+                          ttl=float(os.getenv("REPORT_CACHE_TTL", 3600)))
+
+
+def parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(400, "Month must look like YYYY-MM")
+
+
+def _label(month: date) -> str:
+    # not strftime: glibc does not zero-pad years before 1000, the database does
+    return f"{month.year:04d}-{month.month:02d}"
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _months(first: date, last: date) -> List[date]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = _next_month(first)
+    return months
+
+
+def current_month() -> date:
+    return datetime.utcnow().date().replace(day=1)
+
+
+def _month_label(db: AsyncSession, column):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m", column)
+    return func.to_char(column, "YYYY-MM")
+
+
+async def _query(db: AsyncSession, account_filter, first: date, last: date) -> Dict[str, List[dict]]:
+    month = _month_label(db, DailyFlow.day).label("month")
+    # upper-case like the exchange rates, so ?currency= can convert every row
+    currency = func.upper(Account.currency).label("currency")
+    rows = await db.execute(
+        select(month, currency, Category.id, Category.name,
+               func.sum(DailyFlow.inflow), func.sum(DailyFlow.outflow))
+        .join(Account, Account.id == DailyFlow.account_id)
+        .join(Category, Category.id == DailyFlow.category_id)
+        .where(account_filter, DailyFlow.day >= first, DailyFlow.day < _next_month(last))
+        .group_by(month, currency, Category.id, Category.name)
+        .order_by(month, currency, Category.name)
+    )
+    by_month = {_label(m): [] for m in _months(first, last)}
+    for label, currency, category_id, category_name, income, expense in rows:
+        by_month[label].append({
+            "month": label,
+            "currency": currency,
+            "category_id": category_id,
+            "category_name": category_name,
+            "income": income,
+            "expense": expense,
+            "net": income - expense,
+        })
+    return by_month
+
+
+async def monthly(db: AsyncSession, scope: Tuple[str, UUID], account_filter,
+                  first: Optional[date], last: Optional[date]) -> List[dict]:
+    """Income/expense per month, currency and category. Closed months come from the cache."""
+    this_month = current_month()
+    last = min(last or this_month, this_month)
+    if first is None:
+        # twelve months including `last`, or from January of year 1 for the very first months
+        months_back = max(last.year * 12 + last.month - 1 - 11, 12)
+        first = date(months_back // 12, months_back % 12 + 1, 1)
+    if first > last:
+        raise HTTPException(400, "'from' is after 'to'")
+
+    version = await versions.current(db, versions.history(*scope))
+    cached = _closed_months.get(scope)
+    cached = cached[1] if cached is not None and cached[0] == version else {}
+    missing = [m for m in _months(first, last) if m == this_month or _label(m) not in cached]
+    fresh = await _query(db, account_filter, missing[0], missing[-1]) if missing else {}
+
+    closed = {label: rows for label, rows in fresh.items() if parse_month(label) < this_month}
+    if closed:
+        _closed_months.set(scope, (version, {**cached, **closed}))
+
+    result = []
+    for month in _months(first, last):
+        label = _label(month)
+        result.extend(fresh[label] if label in fresh else cached[label])
+    return result
+
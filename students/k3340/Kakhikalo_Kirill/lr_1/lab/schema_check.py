@@ -0,0 +1,69 @@
+"""Checks that the Alembic migrations build exactly the schema described by model.py.
+
+    python schema_check.py            # migrates a scratch SQLite database
+    python schema_check.py <db url>   # or an empty database of your choice
+"""
+import os
+import sys
+import tempfile
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine
+
+from config import SCHEMA_REVISION
+from model import Base
+from partitions import include_name
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def alembic_config(connection=None) -> Config:
+    config = Config(ALEMBIC_INI)
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def schema_drift(db_url: str) -> list:
+    """Runs `upgrade head` on an empty database and returns the differences from Base.metadata."""
+    engine = create_engine(db_url)
+    try:
+        with engine.begin() as connection:
+            command.upgrade(alembic_config(connection), "head")
+            # SQLite reflects UUID columns back as NUMERIC, so types are only compared elsewhere
+            context = MigrationContext.configure(connection, opts={
+                "compare_type": connection.dialect.name != "sqlite",
+                "include_name": include_name,
+            })
+            return compare_metadata(context, Base.metadata)
+    finally:
+        engine.dispose()
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def main() -> int:
+    head = head_revision()
+    if head != SCHEMA_REVISION:
+        print(f"config.SCHEMA_REVISION is {SCHEMA_REVISION}, migrations head is {head}")
+        return 1
+
+    if len(sys.argv) > 1:
+        diffs = schema_drift(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            diffs = schema_drift(f"sqlite:///{os.path.join(tmp, 'schema_check.db')}")
+    for diff in diffs:
+        print(diff)
+    print("schema drift found" if diffs else "migrations match the models")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
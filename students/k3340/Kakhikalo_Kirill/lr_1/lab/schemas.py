@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import BaseModel, SecretStr
 
 
@@ -32,6 +32,15 @@ class AccountRead(AccountCreate):
     class Config:
         orm_mode = True
 
+class AccountBalance(BaseModel):
+    account_id: UUID
+    at: datetime
+    balance: int
+
+class BalancePoint(BaseModel):
+    day: date
+    balance: int
+
 class CategoryCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -59,6 +68,20 @@ class TransactionRead(BaseModel):
     class Config:
         orm_mode = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionRead]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[ImportRowError]
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -69,6 +92,8 @@ class BudgetRead(BaseModel):
     limit: int
     start_date: datetime
     end_date: datetime
+    categories: List[CategoryRead] = []
+    spent: int = 0
 
     class Config:
         orm_mode = True
@@ -78,10 +103,51 @@ class BudgetCreate(BaseModel):
     limit: int
     start_date: datetime
     end_date: datetime
+    category_ids: List[UUID] = []
 
     class Config:
         orm_mode = True
 
+class BudgetUsage(BaseModel):
+    budget_id: UUID
+    limit: int
+    spent: int
+    remaining: int
+    exceeded: bool
+
+class TransactionCreated(TransactionRead):
+    alerts: List[BudgetUsage] = []
+
+class DashboardAccount(AccountRead):
+    recent_transactions: List[TransactionRead] = []
+
+class DashboardBudget(BudgetRead):
+    remaining: int
+    exceeded: bool
+
+class MonthlyReportRow(BaseModel):
+    month: str
+    currency: str
+    category_id: UUID
+    category_name: str
+    income: int
+    expense: int
+    net: int
+
+class ExchangeRateWrite(BaseModel):
+    currency: str
+    rate: float
+
+class CurrencyBalance(BaseModel):
+    currency: str
+    balance: int
+    converted: int
+
+class NetWorth(BaseModel):
+    currency: str
+    total: int
+    by_currency: List[CurrencyBalance]
+
 class TargetCreate(BaseModel):
     account_id: UUID
     name: str
@@ -96,6 +162,31 @@ class TargetCreate(BaseModel):
 class TargetRead(TargetCreate):
     id: UUID
     created_at: datetime
+    current_amount: Optional[int] = None
+    remaining: Optional[int] = None
+    progress: Optional[float] = None
+    required_daily: Optional[int] = None
+    average_daily_net: Optional[float] = None
+    projected_completion: Optional[datetime] = None
+    on_track: Optional[bool] = None
 
     class Config:
         orm_mode = True
+
+
+class Dashboard(BaseModel):
+    user: UserRead
+    accounts: List[DashboardAccount]
+    budgets: List[DashboardBudget]
+    targets: List[TargetRead]
+
+
+class PoolStatsRead(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow_in_use: int
+    acquired: int
+    timeouts: int
+    wait_avg_ms: float
+    wait_max_ms: float
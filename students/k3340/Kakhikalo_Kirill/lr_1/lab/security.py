@@ -1,16 +1,63 @@
+import asyncio
+import functools
 import os
-from passlib.context import CryptContext
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import config  # noqa: F401
 
-load_dotenv()
 pepper = os.getenv('PEPPER')
 
-pwd_context = CryptContext(schemes=["argon2"])
+
+@functools.lru_cache(maxsize=None)
+def pwd_context():
+    """Built on first use: importing passlib and argon2 is a noticeable part of start-up."""
+    from passlib.context import CryptContext
+
+    # changing any of these makes old hashes "need update", they get rehashed on next login
+    return CryptContext(
+        schemes=["argon2"],
+        argon2__rounds=int(os.getenv('ARGON2_TIME_COST', 3)),
+        argon2__memory_cost=int(os.getenv('ARGON2_MEMORY_COST', 65536)),
+        argon2__parallelism=int(os.getenv('ARGON2_PARALLELISM', 4)),
+    )
+
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', 16))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="argon2")
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+class HashingBusy(Exception):
+    pass
+
 
 def hash_password(plain_password: str) -> str:
     pwd_with_pepper = plain_password + pepper
-    return pwd_context.hash(pwd_with_pepper)
+    return pwd_context().hash(pwd_with_pepper)
 
 def verify_password(plain_password: str, hashed: str) -> bool:
     pwd_with_pepper = plain_password + pepper
-    return pwd_context.verify(pwd_with_pepper, hashed)
+    return pwd_context().verify(pwd_with_pepper, hashed)
+
+def verify_and_update(plain_password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    pwd_with_pepper = plain_password + pepper
+    return pwd_context().verify_and_update(pwd_with_pepper, hashed)
+
+
+async def _submit(func, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    future = _executor.submit(func, *args)
+    # the slot is held until the hash finishes, even if the request gave up waiting
+    future.add_done_callback(lambda _: _slots.release())
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await _submit(hash_password, plain_password)
+
+async def verify_and_update_async(plain_password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _submit(verify_and_update, plain_password, hashed)
@@ -0,0 +1,205 @@
+"""Balance checkpoints every SNAPSHOT_EVERY_DAYS days, so past balances cost a bounded delta.
+
+    python snapshots.py               # one compaction pass
+
+Meant to run from cron (hourly is plenty), not from the app's workers. Snapshots hold the balance at the end of their day and are derived from daily_flows. An
+account's opening balance is its current balance minus all of its flows.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import connections
+import ledger
+from model import Account, BalanceSnapshot, DailyFlow, Transaction
+
+SNAPSHOT_EVERY_DAYS = int(os.getenv("SNAPSHOT_EVERY_DAYS", 7))
+# serializes compaction against invalidation of back-dated checkpoints; any constant works
+LOCK_KEY = 0x736e617073
+MAX_POINTS = 1000
+BATCH_SIZE = 1000
+# lookups step back a day from the requested one; anything earlier is before every account anyway
+EARLIEST = datetime.min + timedelta(days=1)
+
+NET = func.sum(DailyFlow.inflow - DailyFlow.outflow)
+
+
+def is_checkpoint(day: date) -> bool:
+    return day.toordinal() % SNAPSHOT_EVERY_DAYS == 0
+
+
+async def lock(db: AsyncSession):
+    """Held until the transaction ends, so a pass never reads flows that an uncommitted import
+    will invalidate. SQLite already serializes writers."""
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+
+
+async def compact(db: AsyncSession) -> int:
+    """Writes every missing checkpoint up to yesterday, for all accounts. Returns how many."""
+    await lock(db)
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    latest = (
+        select(BalanceSnapshot.account_id, func.max(BalanceSnapshot.day).label("day"))
+        .group_by(BalanceSnapshot.account_id)
+        .subquery()
+    )
+    starts: Dict[UUID, Tuple[Optional[date], int]] = {
+        account_id: (day, balance)
+        for account_id, day, balance in await db.execute(
+            select(BalanceSnapshot.account_id, BalanceSnapshot.day, BalanceSnapshot.balance)
+            .join(latest, and_(latest.c.account_id == BalanceSnapshot.account_id, latest.c.day == BalanceSnapshot.day))
+        )
+    }
+    # one statement, so the balance and the flows it is made of are read at the same moment
+    totals = select(DailyFlow.account_id, NET.label("net")).group_by(DailyFlow.account_id).subquery()
+    for account_id, opening in await db.execute(
+            select(Account.id, Account.balance - totals.c.net).join(totals, totals.c.account_id == Account.id)):
+        starts.setdefault(account_id, (None, opening))
+
+    series = await db.stream(
+        select(DailyFlow.account_id, DailyFlow.day, NET)
+        .outerjoin(latest, latest.c.account_id == DailyFlow.account_id)
+        .where(DailyFlow.day <= yesterday, or_(latest.c.day.is_(None), DailyFlow.day > latest.c.day))
+        .group_by(DailyFlow.account_id, DailyFlow.day)
+        .order_by(DailyFlow.account_id, DailyFlow.day)
+    )
+    rows: List[dict] = []
+    written = 0
+    seen = set()
+    current, running, day = None, 0, None
+    async for account_id, flow_day, net in series:
+        if account_id != current:
+            if current is not None:
+                rows.extend(_checkpoints(current, day, yesterday, running))
+            current = account_id
+            seen.add(account_id)
+            day, running = starts[account_id]
+            if day is None:
+                day = flow_day - timedelta(days=1)
+        rows.extend(_checkpoints(account_id, day, flow_day - timedelta(days=1), running))
+        running += net
+        day = flow_day
+        if is_checkpoint(day):
+            rows.append({"account_id": account_id, "day": day, "balance": running})
+        if len(rows) >= BATCH_SIZE:
+            written += await _write(db, rows)
+    if current is not None:
+        rows.extend(_checkpoints(current, day, yesterday, running))
+
+    # accounts without new flows still get their checkpoints, so lookups never walk far
+    for account_id, (last_day, balance) in starts.items():
+        if last_day is not None and account_id not in seen:
+            rows.extend(_checkpoints(account_id, last_day, yesterday, balance))
+            if len(rows) >= BATCH_SIZE:
+                written += await _write(db, rows)
+
+    written += await _write(db, rows)
+    await db.commit()
+    return written
+
+
+async def _write(db: AsyncSession, rows: List[dict]) -> int:
+    count = len(rows)
+    if rows:
+        await db.execute(ledger.dialect_insert(db)(BalanceSnapshot).values(rows).on_conflict_do_nothing())
+        rows.clear()
+    return count
+
+
+def _checkpoints(account_id: UUID, after: date, through: date, balance: int) -> List[dict]:
+    """Checkpoint rows for the days in (after, through], all at `balance`."""
+    day = after + timedelta(days=1)
+    while not is_checkpoint(day):
+        day += timedelta(days=1)
+    rows = []
+    while day <= through:
+        rows.append({"account_id": account_id, "day": day, "balance": balance})
+        day += timedelta(days=SNAPSHOT_EVERY_DAYS)
+    return rows
+
+
+async def _net(db: AsyncSession, account_id: UUID, after: date, through: date) -> int:
+    return await db.scalar(
+        select(NET).where(DailyFlow.account_id == account_id, DailyFlow.day > after, DailyFlow.day <= through)
+    ) or 0
+
+
+async def balance_at_end_of(db: AsyncSession, account_id: UUID, current_balance: int, day: date) -> int:
+    """From the nearest checkpoint on either side, else backwards from the current balance."""
+    before = (await db.execute(
+        select(BalanceSnapshot.day, BalanceSnapshot.balance)
+        .where(BalanceSnapshot.account_id == account_id, BalanceSnapshot.day <= day)
+        .order_by(BalanceSnapshot.day.desc())
+        .limit(1)
+    )).first()
+    if before is not None:
+        return before.balance + await _net(db, account_id, before.day, day)
+
+    after = (await db.execute(
+        select(BalanceSnapshot.day, BalanceSnapshot.balance)
+        .where(BalanceSnapshot.account_id == account_id, BalanceSnapshot.day > day)
+        .order_by(BalanceSnapshot.day)
+        .limit(1)
+    )).first()
+    if after is not None:
+        return after.balance - await _net(db, account_id, day, after.day)
+    return current_balance - await _net(db, account_id, day, date.max)
+
+
+async def balance_at(db: AsyncSession, account_id: UUID, current_balance: int, at: datetime) -> int:
+    """Whole days from the checkpoints, then the rows of `at`'s own day up to `at`.
+
+    The intraday part reads the live table only; for archived days it counts from midnight.
+    """
+    if at >= datetime.utcnow():
+        return current_balance
+    at = max(at, EARLIEST)
+    day_start = datetime.combine(at.date(), datetime.min.time())
+    balance = await balance_at_end_of(db, account_id, current_balance, at.date() - timedelta(days=1))
+    return balance + (await db.scalar(
+        select(func.sum(Transaction.amount))
+        .where(Transaction.account_id == account_id, Transaction.timestamp >= day_start, Transaction.timestamp <= at)
+    ) or 0)
+
+
+async def history(db: AsyncSession, account_id: UUID, current_balance: int, first: date, last: date,
+                  step: int) -> List[dict]:
+    """End-of-bucket balances for buckets of `step` days from `first` through `last`."""
+    first = max(first, EARLIEST.date())
+    balance = await balance_at_end_of(db, account_id, current_balance, first - timedelta(days=1))
+    nets = dict((await db.execute(
+        select(DailyFlow.day, NET)
+        .where(DailyFlow.account_id == account_id, DailyFlow.day >= first, DailyFlow.day <= last)
+        .group_by(DailyFlow.day)
+    )).all())
+
+    points = []
+    day = first
+    while day <= last:
+        balance += nets.get(day, 0)
+        if (day - first).days % step == step - 1 or day == last:
+            points.append({"day": day, "balance": balance})
+        day += timedelta(days=1)
+    return points
+
+
+async def invalidate(db: AsyncSession, account_id: UUID, since: date):
+    """Back-dated writes change every checkpoint from their day on; the next pass rebuilds them."""
+    await lock(db)
+    await db.execute(delete(BalanceSnapshot).where(BalanceSnapshot.account_id == account_id,
+                                                   BalanceSnapshot.day >= since))
+
+
+async def _main():
+    async with connections.AsyncSessionLocal() as db:
+        print(f"snapshots written: {await compact(db)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,112 @@
+"""Every endpoint with a @query_budget, run once on SQLite with cold caches and enforcement on.
+
+    cd lab && python -m pytest -q tests
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAB_DIR not in sys.path:
+    sys.path.insert(0, LAB_DIR)
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "test_query_budget.db")
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+# read at import time by the modules below, so set before importing them
+os.environ["DB_ADMIN"] = f"sqlite:///{DB_PATH}"
+os.environ["DB_CREATE_ALL"] = "1"
+os.environ["QUERY_BUDGET_ENFORCE"] = "1"
+os.environ["ADMIN_API_KEY"] = "test-admin-key"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("PEPPER", "test-pepper")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import auth  # noqa: E402
+import main  # noqa: E402
+import progress  # noqa: E402
+import rates  # noqa: E402
+import reports  # noqa: E402
+import versions  # noqa: E402
+
+PASSWORD = "test-password"
+
+# query parameters for routes that need them; every budgeted route has to be listed here
+PARAMS = {
+    "/users/me/dashboard": {},
+    "/users": {},
+    "/accounts": {},
+    "/accounts/{account_id}/balance": {"at": "2026-01-15T12:00:00"},
+    "/accounts/{account_id}/balance/history": {"bucket": "week", "from": "2026-01-01"},
+    "/categories": {},
+    "/accounts/{account_id}/transactions": {"date_from": "2025-12-01T00:00:00+03:00"},
+    "/accounts/{account_id}/transactions/export": {"format": "ndjson"},
+    "/accounts/{account_id}/reports/monthly": {"from": "2025-12"},
+    "/users/me/reports/monthly": {"currency": "USD"},
+    "/users/me/net-worth": {"currency": "USD"},
+    "/budgets": {},
+    "/budgets/{budget_id}/usage": {},
+    "/targets": {},
+}
+
+
+def budgeted_routes():
+    return sorted(
+        route.path for route in main.app.routes
+        if getattr(getattr(route, "endpoint", None), "query_budget", None) is not None
+    )
+
+
+def cold_caches():
+    """As in a freshly started worker: the worst case a budget has to cover."""
+    for cache in (auth.user_cache, progress._net_flow, rates._matrix, reports._closed_months, versions._bodies):
+        cache.clear()
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    with TestClient(main.app) as client:
+        client.post("/users", json={"username": "budget", "email": "budget@test", "password": PASSWORD})
+        token = client.post("/token", data={"username": "budget", "password": PASSWORD}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        category = client.post("/categories", json={"name": "food"}).json()["id"]
+        account = client.post("/accounts", json={"name": "main", "balance": 10000, "currency": "RUB"},
+                              headers=headers).json()["id"]
+        rows = [{"amount": -100 - day, "category_id": category, "timestamp": f"2026-01-{day:02d}T10:00:00"}
+                for day in range(1, 29)]
+        client.post(f"/accounts/{account}/transactions/import",
+                    content="\n".join(json.dumps(row) for row in rows).encode(),
+                    headers={**headers, "Content-Type": "application/x-ndjson"}).raise_for_status()
+        client.post(f"/accounts/{account}/transactions", headers=headers, json={
+            "account_id": account, "amount": -5, "category_id": category, "description": None,
+        }).raise_for_status()
+        now = datetime.utcnow()
+        budget = client.post("/budgets", headers=headers, json={
+            "account_id": account, "limit": 1000, "category_ids": [category],
+            "start_date": (now - timedelta(days=1)).isoformat(), "end_date": (now + timedelta(days=1)).isoformat(),
+        }).json()["id"]
+        client.post("/targets", headers=headers, json={
+            "account_id": account, "name": "goal", "target_amount": 10 ** 6,
+            "deadline": (now + timedelta(days=365)).isoformat(),
+        }).raise_for_status()
+        client.put("/internal/exchange-rates", headers={"X-Admin-Key": "test-admin-key"},
+                   json=[{"currency": "RUB", "rate": 1.0}, {"currency": "USD", "rate": 90.0}]).raise_for_status()
+        yield client, headers, {"account_id": account, "budget_id": budget}
+
+
+def test_every_budgeted_route_is_exercised():
+    assert budgeted_routes() == sorted(PARAMS)
+
+
+@pytest.mark.parametrize("path", sorted(PARAMS))
+def test_query_budget_with_cold_caches(seeded, path):
+    client, headers, ids = seeded
+    cold_caches()
+    # QueryBudgetExceeded propagates out of the test client when the budget is blown
+    response = client.get(path.format(**ids), params=PARAMS[path], headers=headers)
+    assert response.status_code == 200, response.text
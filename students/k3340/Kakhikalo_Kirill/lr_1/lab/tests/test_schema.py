@@ -0,0 +1,49 @@
+"""The Alembic migrations against model.py and config.SCHEMA_REVISION, on scratch SQLite databases.
+
+    cd lab && python -m pytest -q tests
+"""
+import os
+import sys
+import uuid
+
+from alembic import command
+from sqlalchemy import create_engine, text
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LAB_DIR not in sys.path:
+    sys.path.insert(0, LAB_DIR)
+
+import config  # noqa: E402
+import schema_check  # noqa: E402
+
+
+def test_head_matches_schema_revision():
+    assert schema_check.head_revision() == config.SCHEMA_REVISION
+
+
+def test_migrations_match_models(tmp_path):
+    assert schema_check.schema_drift(f"sqlite:///{tmp_path / 'drift.db'}") == []
+
+
+def test_daily_flows_backfilled_from_existing_transactions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    account, category = uuid.uuid4().hex, uuid.uuid4().hex
+    rows = [(500, "2026-01-02 09:00:00"), (-200, "2026-01-02 18:00:00"), (-50, "2026-01-03 12:00:00")]
+    try:
+        with engine.begin() as connection:
+            command.upgrade(schema_check.alembic_config(connection), "95e95c868441")
+            for amount, timestamp in rows:
+                connection.execute(
+                    text("INSERT INTO transactions (id, account_id, amount, timestamp, category_id) "
+                         "VALUES (:id, :account, :amount, :timestamp, :category)"),
+                    {"id": uuid.uuid4().hex, "account": account, "amount": amount,
+                     "timestamp": timestamp, "category": category},
+                )
+            command.upgrade(schema_check.alembic_config(connection), "3f2a9c1d7b44")
+            flows = connection.execute(
+                text("SELECT day, inflow, outflow FROM daily_flows ORDER BY day")
+            ).all()
+    finally:
+        engine.dispose()
+
+    assert [tuple(row) for row in flows] == [("2026-01-02", 500, 200), ("2026-01-03", 0, 50)]
@@ -0,0 +1,124 @@
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+import metrics
+
+PHASES = ("jwt", "user", "db", "commit_wait", "serialize")
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def install(engine):
+    # the start goes on the statement's execution context: a failing statement never reaches
+    # after_cursor_execute, and state kept on the pooled connection would pile up
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        timings = _timings.get()
+        if timings is not None and started is not None:
+            timings["db"] = timings.get("db", 0.0) + time.perf_counter() - started
+
+
+def _mark_endpoint_done(endpoint):
+    """Remembers when the endpoint returned; what follows in the route handler is serialization."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _done()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _done()
+    return wrapper
+
+
+def _done():
+    timings = _timings.get()
+    if timings is not None:
+        timings["endpoint_done"] = time.perf_counter()
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = [f"{name};dur={timings[name] * 1000:.2f}" for name in PHASES if name in timings]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class TimedRoute(APIRoute):
+    """Marks when the endpoint returned, so TimingMiddleware can tell serialization apart."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+
+class TimingMiddleware:
+    """Adds a Server-Timing header and feeds the /metrics histograms, labelled by route template.
+
+    Works on the final http.response.start, so responses built by exception handlers (404, 422,
+    the 503 for HashingBusy) carry the header and their real status too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        outcome = {"status": 500, "finished": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                outcome["status"] = message["status"]
+                outcome["finished"] = finished = time.perf_counter()
+                if "endpoint_done" in timings:
+                    timings["serialize"] = finished - timings.pop("endpoint_done")
+                header = server_timing(timings, finished - started).encode("latin-1")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            # requests no route matched are not worth a label of their own
+            if route is not None:
+                total = (outcome["finished"] or time.perf_counter()) - started
+                metrics.request_duration.observe((scope["method"], route, str(outcome["status"])), total)
+                for name in PHASES:
+                    if name in timings:
+                        metrics.request_phase_duration.observe((route, name), timings[name])
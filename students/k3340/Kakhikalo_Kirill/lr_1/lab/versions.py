@@ -0,0 +1,58 @@
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import fastjson
+import ledger
+import listing
+from cache import TTLCache
+from model import ResourceVersion
+
+CATEGORIES = "categories"
+USERS = "users"
+EXCHANGE_RATES = "exchange_rates"
+
+
+def history(kind: str, owner_id) -> str:
+    """Per account ("account") or per user ("user"): bumped by writes that change closed months."""
+    return f"history-{kind}-{owner_id}"
+
+
+# resource name -> (version, serialized body); the version check makes the TTL only a memory bound
+_bodies = TTLCache(maxsize=64, ttl=24 * 3600)
+
+
+async def current(db: AsyncSession, name: str) -> int:
+    return await db.scalar(select(ResourceVersion.version).where(ResourceVersion.name == name)) or 0
+
+
+async def bump(db: AsyncSession, name: str):
+    """Call before committing the write that changes the collection."""
+    stmt = ledger.dialect_insert(db)(ResourceVersion).values(name=name, version=1)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ResourceVersion.name],
+        set_={"version": ResourceVersion.version + 1},
+    ))
+
+
+def etag(name: str, version: int) -> str:
+    return f'"{name}-{version}"'
+
+
+async def cached_listing(request: Request, db: AsyncSession, name: str, query) -> Response:
+    """JSON list of `query` rows with an ETag; 304 when the client already has this version."""
+    # version first: rows read afterwards are at least this new, never cached under a newer tag
+    version = await current(db, name)
+    tag = etag(name, version)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if tag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    cached = _bodies.get(name)
+    if cached is not None and cached[0] == version:
+        body = cached[1]
+    else:
+        body = fastjson.dumps(listing.plain(await db.execute(query)))
+        _bodies.set(name, (version, body))
+    return Response(body, media_type="application/json", headers=headers)